@@ -1,21 +1,44 @@
-import tkinter as tk
-from tkinter import filedialog, ttk, messagebox, simpledialog, Menu
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.widgets import LassoSelector
-from matplotlib.path import Path
 import re
 import os
+import sys
+import importlib
+import importlib.util
+import json
+import io
+import csv
+import codecs
+import bisect
+import math
+import itertools
 import random
-from matplotlib import font_manager
+import time
+import threading
+from functools import lru_cache, wraps
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import queue
 
-# === 尝试导入简繁转换库 ===
-try:
-    import opencc
-    HAS_OPENCC = True
-except ImportError:
-    HAS_OPENCC = False
+
+# === 延迟导入：重量级模块在首次使用时才真正导入 ===
+class _LazyModule:
+    def __init__(self, name, alias):
+        self._name, self._alias = name, alias
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module  # 之后直接访问真实模块
+        return getattr(module, attr)
+
+
+pd = _LazyModule("pandas", "pd")
+np = _LazyModule("numpy", "np")
+
+# === 简繁转换库 / Parquet 支持 (可选，只检查是否安装) ===
+HAS_OPENCC = importlib.util.find_spec("opencc") is not None
+opencc = _LazyModule("opencc", "opencc")
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+pa = _LazyModule("pyarrow", "pa")
+pq = _LazyModule("pyarrow.parquet", "pq")
 
 # ==========================================
 # 🎨 现代化主题配色
@@ -33,18 +56,102 @@ THEME_COLORS = {
     'hover': '#E9ECEF'         # 悬停色
 }
 
+# 超过该行数时分类树进入虚拟化模式，只生成可见窗口内的条目
+VIRTUAL_TREE_THRESHOLD = 20000
+
+# 粘贴大量数据时输入框只显示前若干行
+TEXT_PREVIEW_LINES = 2000
+
+# 超过该大小的文件按块流式导入 (Y/X 存为 float32，名称存为分类编码)
+CHUNKED_IMPORT_BYTES = 64 * 1024 * 1024
+CHUNK_LINES = 500000
+
+# 散点图最多绘制的点数，超出时绘制固定随机抽样
+PLOT_SAMPLE_LIMIT = 200000
+
+# 超过该点数时默认改用聚合密度图 (可在界面中调整)；视野内点数不超过 DENSITY_DETAIL_POINTS 时恢复逐点绘制
+DENSITY_MODE_POINTS = 50000
+DENSITY_DETAIL_POINTS = 20000
+# 聚合图每格的屏幕尺寸 (像素)
+DENSITY_CELL_PX = 4
+
+# 项目文件标识
+SESSION_MAGIC = b"FLSESS01"
+
+# 标签分层显示时的屏幕网格 (像素)，每格最多显示一个标签
+LABEL_CELL_SIZE = (80, 22)
+
+# 导出时每次写入磁盘的行数
+EXPORT_CHUNK_ROWS = 100000
+
+# 简繁转换结果缓存的条目数
+CONVERT_CACHE_SIZE = 65536
+
+# 撤销历史上限：步数与记录的行/索引总数，超出时丢弃最早的步骤
+UNDO_LIMIT = 500
+UNDO_MAX_ITEMS = 2000000
+
+# 性能记录最多保留的区间数；统计面板刷新间隔 (毫秒)
+TRACE_MAX_SPANS = 100000
+TRACE_PANEL_MS = 500
+TRACE_PANEL_STAGES = [("解析", "parse"), ("分类", "classify"), ("树", "display_groups"),
+                      ("报告", "generate_report_from_tree"), ("绘图", "update_plot_view"),
+                      ("重绘", "canvas.draw"), ("刷新", "flush_refresh")]
+
+# 后台线程数与结果轮询间隔 (毫秒)；超过该行数的重新分类放到后台线程进行
+WORKER_THREADS = 2
+JOB_POLL_MS = 30
+BACKGROUND_CLASSIFY_ROWS = 100000
+
+# 自动分割：可选方法 (界面名称 → 方法)、界面上最多建议的分割线条数；
+# Y 取值种类超过 AUTO_SPLIT_MAX_ATOMS 时先等宽分箱再聚类，K 均值最多迭代 KMEANS_MAX_ITER 次
+AUTO_SPLIT_METHODS = {"自然断点": "jenks", "K 均值": "kmeans", "等分位": "quantile"}
+AUTO_SPLIT_MAX = 20
+AUTO_SPLIT_MAX_ATOMS = 1000
+KMEANS_MAX_ITER = 100
+
 # ==========================================
 # 🛑 字体配置 (Windows 环境)
 # ==========================================
+# 字体解析结果缓存：避免每次启动都解析字体文件
+FONT_CACHE_PATH = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+                               "fl", "font.json")
+
+
+def _read_font_cache():
+    try:
+        with open(FONT_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_font_cache(entry):
+    try:
+        os.makedirs(os.path.dirname(FONT_CACHE_PATH), exist_ok=True)
+        with open(FONT_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+    except OSError:
+        pass
+
+
 def configure_styles_force():
     plt.rcParams['axes.unicode_minus'] = False
     font_paths = [r"C:\Windows\Fonts\msyh.ttc", r"C:\Windows\Fonts\msyh.ttf", r"C:\Windows\Fonts\simhei.ttf"]
+    cache = _read_font_cache()
     font_loaded = False
     for path in font_paths:
         if os.path.exists(path):
             try:
-                font_manager.fontManager.addfont(path)
-                font_name = font_manager.FontProperties(fname=path).get_name()
+                stamp = os.path.getmtime(path)
+                if cache.get('path') == path and cache.get('mtime') == stamp:
+                    font_name = cache['name']
+                else:
+                    font_name = font_manager.FontProperties(fname=path).get_name()
+                    _write_font_cache({'path': path, 'mtime': stamp, 'name': font_name})
+                # 系统字体通常已在 matplotlib 的字体列表中，只有缺失时才注册 (注册需要解析字体文件)
+                if font_name not in {f.name for f in font_manager.fontManager.ttflist}:
+                    font_manager.fontManager.addfont(path)
                 plt.rcParams['font.sans-serif'] = [font_name]
                 font_loaded = True
                 break
@@ -53,7 +160,1026 @@ def configure_styles_force():
     if not font_loaded:
         plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial Unicode MS']
 
-configure_styles_force()
+
+def load_gui():
+    """导入 tkinter (命令行批处理不需要，不在模块导入时执行)"""
+    global tk, tkfont, filedialog, ttk, messagebox, simpledialog, Menu
+    import tkinter as tk
+    from tkinter import font as tkfont
+    from tkinter import filedialog, ttk, messagebox, simpledialog, Menu
+
+
+def load_plotting():
+    """导入 matplotlib 界面部分并配置字体 (绘图页建立时才需要)"""
+    global plt, FigureCanvasTkAgg, NavigationToolbar2Tk, LassoSelector, to_rgba_array, font_manager
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.widgets import LassoSelector
+    from matplotlib.colors import to_rgba_array
+    from matplotlib import font_manager
+    configure_styles_force()
+
+
+# ==========================================
+# ⏱️ 性能记录
+# ==========================================
+class Tracer:
+    """
+    记录各阶段耗时区间 (名称, 开始, 耗时, 线程) 与计数器。
+    关闭时 traced 包装的函数只多一次属性判断，count 直接返回。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.spans = deque(maxlen=TRACE_MAX_SPANS)
+        self.last = {}
+        self.counters = {}
+
+    def record(self, name, start, end):
+        self.spans.append((name, start - self.origin, end - start, threading.current_thread().name))
+        self.last[name] = end - start
+
+    def count(self, name, n=1):
+        if self.enabled: self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """按名称汇总：{名称: {'calls', 'total', 'max'}} (秒)"""
+        totals = {}
+        for name, _, duration, _ in list(self.spans):
+            t = totals.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+            t['calls'] += 1
+            t['total'] += duration
+            t['max'] = max(t['max'], duration)
+        return totals
+
+    def dump_json(self, path):
+        spans = [{'name': n, 'start': s, 'duration': d, 'thread': t} for n, s, d, t in list(self.spans)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'spans': spans, 'summary': self.summary(), 'counters': dict(self.counters)}, f,
+                      ensure_ascii=False, indent=1)
+
+    def dump_csv(self, path):
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "start_ms", "duration_ms", "thread"])
+            writer.writerows((n, f"{s * 1000:.3f}", f"{d * 1000:.3f}", t) for n, s, d, t in list(self.spans))
+            writer.writerow([])
+            writer.writerow(["counter", "value"])
+            writer.writerows(sorted(self.counters.items()))
+
+
+TRACER = Tracer()
+
+
+def traced(name):
+    """把函数的每次调用记录为名为 name 的耗时区间"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled: return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                TRACER.record(name, start, time.perf_counter())
+        return wrapper
+    return decorate
+
+
+# ==========================================
+# 📏 自动分割 (一维聚类建议分割线)
+# ==========================================
+def split_atoms(values, max_atoms=AUTO_SPLIT_MAX_ATOMS):
+    """
+    排序后的取值按相同值合并为聚类单元；种类超过 max_atoms 时按等宽分箱合并。
+    返回 (排序值, 各单元起点, 累计权重, 累计和, 累计平方和)，累计量长度为单元数 + 1。
+    """
+    v = np.sort(values[~np.isnan(values)])
+    if not len(v): return None
+    if v[-1] - v[0] > 0 and len(np.unique(v)) > max_atoms:
+        edges = np.linspace(v[0], v[-1], max_atoms + 1)
+        b = np.minimum(np.searchsorted(edges, v, side='right') - 1, max_atoms - 1)
+    else:
+        b = v
+    start = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    c = v - v.mean()  # 居中后再累加，减小平方和的舍入误差
+    cuts = np.r_[start, len(v)]
+    w = cuts.astype(float)
+    s1 = np.r_[0.0, np.cumsum(c)][cuts]
+    s2 = np.r_[0.0, np.cumsum(c * c)][cuts]
+    return v, start, w, s1, s2
+
+
+def split_quantile(w, s1, s2, k):
+    """等分位：每类点数尽量相同"""
+    m = len(w) - 1
+    targets = w[-1] * np.arange(1, k + 1) / (k + 1)
+    return np.unique(np.clip(np.searchsorted(w, targets), 1, m - 1))
+
+
+def split_kmeans(w, s1, s2, k):
+    """一维 K 均值：以等分位为初值，用累计量 O(k) 求各类均值，二分查找重新划界"""
+    m = len(w) - 1
+    centers = np.diff(s1) / np.diff(w)
+    breaks = split_quantile(w, s1, s2, k)
+    for _ in range(KMEANS_MAX_ITER):
+        bounds = np.r_[0, breaks, m]
+        means = (s1[bounds[1:]] - s1[bounds[:-1]]) / (w[bounds[1:]] - w[bounds[:-1]])
+        new = np.unique(np.clip(np.searchsorted(centers, (means[:-1] + means[1:]) / 2, side='right'), 1, m - 1))
+        if np.array_equal(new, breaks): break
+        breaks = new
+    return breaks
+
+
+def split_jenks(w, s1, s2, k):
+    """自然断点：动态规划使各类离差平方和之和最小，O(k·m²) (m 为单元数)"""
+    m = len(w) - 1
+    if m <= k + 1: return np.arange(1, m)
+    # ssd[i, j]：单元 i..j-1 的离差平方和 (i < j)
+    dw = w[None, :] - w[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ssd = (s2[None, :] - s2[:, None]) - (s1[None, :] - s1[:, None]) ** 2 / dw
+    ssd[dw <= 0] = np.inf
+    cost, back = ssd[0], []
+    for _ in range(k):
+        total = cost[:, None] + ssd
+        back.append(np.argmin(total, axis=0))
+        cost = total[back[-1], np.arange(m + 1)]
+    breaks, j = [], m
+    for b in reversed(back):
+        j = int(b[j])
+        breaks.append(j)
+    return np.array(breaks[::-1])
+
+
+def nice_cut(lo, hi, dtype):
+    """在 (lo, hi] 中取小数位最少的分割值 (按 Y 列精度比较，保证 lo 归下一类、hi 归上一类)"""
+    # 从 lo 在该精度下的最短十进制形式出发 (float32 的 0.7 实为 0.69999998…，直接取整会得到 0.7 本身)
+    lo = float(str(dtype.type(lo)))
+    for d in range(7):
+        t = round(math.floor(lo * 10 ** d) / 10 ** d + 10 ** -d, d)
+        if lo < dtype.type(t) <= hi: return t
+    return float(hi)
+
+
+def suggest_cuts(values, k, method, dtype=None, atoms=None):
+    """按一维分布建议至多 k 条分割线 (相同取值不会被拆开)；atoms 可传入预先算好的 split_atoms 结果"""
+    dtype = np.dtype(float) if dtype is None else dtype
+    atoms = split_atoms(values) if atoms is None else atoms
+    if atoms is None or k < 1: return []
+    v, start, w, s1, s2 = atoms
+    if len(start) < 2: return []
+    breaks = {'jenks': split_jenks, 'kmeans': split_kmeans, 'quantile': split_quantile}[method](w, s1, s2, k)
+    return [nice_cut(float(v[start[j] - 1]), float(v[start[j]]), dtype) for j in breaks.tolist()]
+
+
+# ==========================================
+# 🧮 分类引擎 (不依赖界面)
+# ==========================================
+def _align(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def read_session_header(path):
+    """读取项目文件头，返回 (JSON 头, 数组区起始偏移)"""
+    with open(path, 'rb') as f:
+        if f.read(8) != SESSION_MAGIC: raise ValueError("不是有效的项目文件")
+        size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(size).decode('utf-8'))
+    return header, _align(16 + size)
+
+
+class GridIndex:
+    """
+    点的均匀网格索引 (按行位置)：点按网格单元排序存放，同一行单元在数组中连续。
+    圈选时先按多边形外接矩形取候选点，再做精确的点在多边形内判断。
+    坐标为空的点放在末尾的空单元中，不参与查询。
+    """
+
+    def __init__(self, x, y):
+        n = len(x)
+        self.g = int(min(1024, max(1, np.sqrt(n / 8))))
+        finite = np.isfinite(x) & np.isfinite(y)
+        if finite.any():
+            self.x0, self.x1 = float(x[finite].min()), float(x[finite].max())
+            self.y0, self.y1 = float(y[finite].min()), float(y[finite].max())
+        else:
+            self.x0 = self.x1 = self.y0 = self.y1 = 0.0
+        self.ncells = self.g * self.g
+        cells = self.cells_of(x, y)
+        self.order = np.argsort(cells, kind='stable')
+        self.starts = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.ncells + 1))])
+
+    def _axis(self, v, lo, hi):
+        span = hi - lo
+        c = np.zeros(len(v), dtype=np.int64) if span <= 0 else np.floor((v - lo) / span * self.g)
+        return np.clip(np.nan_to_num(c), 0, self.g - 1).astype(np.int64)
+
+    def cells_of(self, x, y):
+        """网格外的点归入边缘单元，坐标为空的点归入空单元 (编号 ncells)"""
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        cells = self._axis(y, self.y0, self.y1) * self.g + self._axis(x, self.x0, self.x1)
+        cells[~(np.isfinite(x) & np.isfinite(y))] = self.ncells
+        return cells
+
+    def query(self, verts, x, y):
+        """返回落在多边形内的行位置 (升序)"""
+        verts = np.asarray(verts, dtype=float)
+        (bx0, by0), (bx1, by1) = verts.min(axis=0), verts.max(axis=0)
+        cx0, cx1 = self._axis(np.array([bx0, bx1]), self.x0, self.x1)
+        cy0, cy1 = self._axis(np.array([by0, by1]), self.y0, self.y1)
+        parts = [self.order[self.starts[r * self.g + cx0]:self.starts[r * self.g + cx1 + 1]]
+                 for r in range(cy0, cy1 + 1)]
+        cand = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        cx, cy = x[cand], y[cand]
+        cand = cand[(cx >= bx0) & (cx <= bx1) & (cy >= by0) & (cy <= by1)]
+        from matplotlib.path import Path
+        inside = Path(verts).contains_points(np.column_stack([x[cand], y[cand]]))
+        return np.sort(cand[inside])
+
+    def insert(self, position, x, y):
+        """在 position 处插入若干点，之后的行位置整体后移"""
+        k = len(x)
+        self.order[self.order >= position] += k
+        cells = self.cells_of(x, y)
+        # 插入偏移相同 (中间隔着空单元) 时 np.insert 按参数顺序放置，需先按单元排序
+        o = np.argsort(cells, kind='stable')
+        self.order = np.insert(self.order, self.starts[cells[o] + 1], position + o)
+        self.starts = self.starts + np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.ncells + 1))])
+
+    def delete(self, positions, x, y):
+        """删除给定行位置 (x/y 为被删点的坐标)，之后的行位置整体前移"""
+        positions = np.sort(np.asarray(positions))
+        removed = np.bincount(self.cells_of(x, y), minlength=self.ncells + 1)
+        self.starts = self.starts - np.concatenate([[0], np.cumsum(removed)])
+        self.order = self.order[~np.isin(self.order, positions)]
+        self.order -= np.searchsorted(positions, self.order)
+
+
+class Classifier:
+    """持有数据与分类状态，计算 分类 → 有序索引 的映射"""
+
+    def __init__(self):
+        self.df = pd.DataFrame(columns=['Label', 'Y', 'X'])
+        # 直线模式的分割线：thresholds 为横线 (Y 值)，x_thresholds 为竖线 (X 值)，两者组成网格
+        self.thresholds = []
+        self.x_thresholds = []
+        self.category_list = []
+        self.marked_indices = set()
+        self.custom_cat_names = {}
+        self.groups = []
+        self._gid = itertools.count()
+        # 逐点样式数组 (按行位置对齐)：所属圈选分类 (-1 为无) 与是否标记
+        self.point_category = np.empty(0, dtype=np.int32)
+        self.point_marked = np.empty(0, dtype=bool)
+        self.grid = None
+        self.session_path = None
+        self._split_cache = None
+        self._replaying = False
+        self.clear_history()
+
+    def set_data(self, df):
+        """载入新数据并清空分类状态"""
+        self.df = df
+        self.grid = None
+        self.groups = []
+        self.session_path = None
+        self.reset()
+
+    def reset(self):
+        self.thresholds, self.category_list, self.marked_indices, self.custom_cat_names = [], [], set(), {}
+        self.x_thresholds = []
+        self.rebuild_point_styles()
+        self.clear_history()
+
+    def rebuild_point_styles(self):
+        """按 category_list / marked_indices 重新生成逐点样式数组"""
+        self.point_category = np.full(len(self.df), -1, dtype=np.int32)
+        for c in range(len(self.category_list) - 1, -1, -1):
+            self.point_category[self.positions(list(self.category_list[c]['indices']))] = c
+        self.point_marked = np.zeros(len(self.df), dtype=bool)
+        self.point_marked[self.positions(list(self.marked_indices))] = True
+
+    # --- 行编辑 ---
+    # 行索引是稳定的行 ID：插入只分配新 ID，删除只移除被删行，
+    # 其余行的圈选归属与标记保持不变，无需重新编号。
+    def next_row_ids(self, count):
+        start = int(self.df.index.max()) + 1 if len(self.df) else 0
+        return pd.RangeIndex(start, start + count)
+
+    def insert_rows(self, position, rows):
+        """在指定位置插入数据行，新行分配新的行 ID"""
+        rows = rows.set_axis(self.next_row_ids(len(rows)))
+        self._record({'kind': 'insert', 'position': position, 'rows': rows})
+        self._insert_rows(position, rows)
+
+    def _conform(self, rows):
+        """新行转换为与 df 相同的列类型 (紧凑帧保持 float32 与分类编码，新名称补入类别)，避免拼接后整列升级"""
+        rows = rows.astype({'Y': self.value_dtype('Y'), 'X': self.value_dtype('X')})
+        label = self.df['Label']
+        if isinstance(label.dtype, pd.CategoricalDtype):
+            names = rows['Label'].astype(str)
+            new = pd.Index(names.unique()).difference(label.cat.categories)
+            if len(new): self.df = self.df.assign(Label=label.cat.add_categories(new))
+            rows = rows.assign(Label=pd.Categorical(names, categories=self.df['Label'].cat.categories))
+        return rows
+
+    def _insert_rows(self, position, rows):
+        rows = self._conform(rows)
+        # 空表的列为 object 类型，与之拼接会把新行也变成 object
+        self.df = rows if self.df.empty else pd.concat([self.df.iloc[:position], rows, self.df.iloc[position:]])
+        self.point_category = np.insert(self.point_category, position, np.full(len(rows), -1, dtype=np.int32))
+        self.point_marked = np.insert(self.point_marked, position, np.zeros(len(rows), dtype=bool))
+        if self.grid is not None:
+            self.grid.insert(position, rows['X'].to_numpy(dtype=float), rows['Y'].to_numpy(dtype=float))
+
+    def delete_rows(self, indices):
+        """删除数据行，只从圈选分类与标记中移除这些行"""
+        pos = np.sort(self.positions(indices))
+        ids = set(self.df.index[pos].tolist())
+        moved = [(cat, cat['indices'] & ids) for cat in self.category_list]
+        self._record({'kind': 'delete', 'positions': pos, 'rows': self.df.iloc[pos],
+                      'moved': [(cat, taken) for cat, taken in moved if taken],
+                      'marked': self.marked_indices & ids})
+        self._delete_positions(pos)
+
+    def _delete_positions(self, pos):
+        ids = set(self.df.index[pos].tolist())
+        for cat in self.category_list: cat['indices'] -= ids
+        self.marked_indices -= ids
+        # 已有分组同步剔除被删行：后台重新分类完成前，树与报告不会引用失效的行 ID
+        gone = np.fromiter(ids, dtype=np.int64, count=len(ids))
+        for g in self.groups: g['indices'] = g['indices'][~np.isin(g['indices'], gone)]
+        if self.grid is not None:
+            self.grid.delete(pos, self.df['X'].to_numpy(dtype=float)[pos], self.df['Y'].to_numpy(dtype=float)[pos])
+        self.df = self.df.drop(self.df.index[pos])
+        self.point_category = np.delete(self.point_category, pos)
+        self.point_marked = np.delete(self.point_marked, pos)
+
+    @traced("lasso_select")
+    def lasso_select(self, verts):
+        """返回落在圈选多边形内的行索引集合 (网格索引按需建立)"""
+        if self.df.empty: return set()
+        x, y = self.df['X'].to_numpy(dtype=float), self.df['Y'].to_numpy(dtype=float)
+        if self.grid is None: self.grid = GridIndex(x, y)
+        return set(self.df.index[self.grid.query(verts, x, y)].tolist())
+
+    @traced("ingest_chunks")
+    def ingest_chunks(self, chunks):
+        """
+        流式导入 iter_table_chunks 产出的数据块：每块到达时即按当前阈值分箱，
+        最后拼接为紧凑列 (Y/X float32，名称为分类编码)。
+        保留阈值与自定义分类名，清空圈选与标记，返回无法解析的行号。
+        """
+        nbins = len(self.line_category_names())
+        frames, rejected, bins, base = [], [], [[] for _ in range(nbins)], 0
+        for df, bad in chunks:
+            rejected += bad
+            if df.empty: continue
+            b = self.line_bins(df['Y'].to_numpy(), df['X'].to_numpy())
+            order = np.argsort(b, kind='stable')
+            bounds = np.searchsorted(b[order], np.arange(nbins + 1))
+            for k in range(nbins):
+                bins[k].append(order[bounds[k]:bounds[k + 1]] + base)
+            frames.append(df)
+            base += len(df)
+        if not frames: return rejected
+        self.df = pd.DataFrame({
+            'Label': pd.api.types.union_categoricals([f['Label'] for f in frames], ignore_order=True),
+            'Y': np.concatenate([f['Y'].to_numpy() for f in frames]),
+            'X': np.concatenate([f['X'].to_numpy() for f in frames])})
+        self.category_list, self.marked_indices = [], set()
+        self.rebuild_point_styles()
+        self.grid = None
+        self.groups = [self._make_group(np.concatenate(parts), key=key)
+                       for parts, key in zip(bins, self.line_category_names())]
+        self.clear_history()
+        return rejected
+
+    def add_lasso_category(self, new_idx, color):
+        """把圈选到的条目提取为新分类 (从之前的圈选分类中移出)"""
+        cat = {'name': f"圈选提取 {len(self.category_list) + 1}", 'indices': new_idx, 'color': color}
+        self._record({'kind': 'lasso', 'cat': cat, 'moved': self._apply_lasso(cat)})
+
+    def _apply_lasso(self, cat):
+        """返回 [(原分类, 被移出的索引子集)]"""
+        moved = []
+        for other in self.category_list:
+            taken = other['indices'] & cat['indices']
+            if taken:
+                other['indices'] -= taken
+                moved.append((other, taken))
+        self.category_list.append(cat)
+        self.point_category[self.positions(list(cat['indices']))] = len(self.category_list) - 1
+        return moved
+
+    def line_category_names(self):
+        """
+        按分割线生成直线分区的默认名称 (也是 custom_cat_names 的键)：只有横线时为各 Y 区间
+        (共 len(thresholds)+1 个)；有竖线时为 Y 区间 × X 区间的网格，按 Y 区间为主序排列。
+        """
+        def bands(t, prefix):
+            if not t: return []
+            return ([f"{prefix}低于 {t[0]}"] + [f"{prefix}{t[i]} ~ {t[i + 1]}" for i in range(len(t) - 1)]
+                    + [f"{prefix}高于 {t[-1]}"])
+        ys, xs = bands(sorted(self.thresholds), ""), bands(sorted(self.x_thresholds), "X ")
+        if not xs: return ys or ["数据区"]
+        return [f"{y} · {x}" for y in ys for x in xs] if ys else xs
+
+    def value_dtype(self, col='Y'):
+        return self.df[col].dtype if self.df[col].dtype.kind == 'f' else np.dtype(float)
+
+    @staticmethod
+    def cuts(values, like):
+        """分割线排序并转换为与数据 like 相同的精度 (float32 数据按 float32 比较，避免边界值错分)"""
+        return np.asarray(sorted(values), dtype=like.dtype if like.dtype.kind == 'f' else float)
+
+    def line_bins(self, y, x):
+        """
+        两次 searchsorted 完成二维分箱：O(N log T)。返回组合的网格编号 (Y 区间 × 每区间网格数 + X 区间，
+        与 line_category_names 顺序一致)；在有分割线的轴上为空值的点为 -1。
+        """
+        by = np.searchsorted(self.cuts(self.thresholds, y), y, side='right')
+        bx = np.searchsorted(self.cuts(self.x_thresholds, x), x, side='right')
+        b = by * (len(self.x_thresholds) + 1) + bx
+        if self.thresholds: b[np.isnan(y)] = -1
+        if self.x_thresholds: b[np.isnan(x)] = -1
+        return b
+
+    def positions(self, indices):
+        """行索引 → 行位置"""
+        return self.df.index.get_indexer(indices)
+
+    def labels_of(self, indices):
+        """行索引对应的标签，已不存在的行为空字符串"""
+        pos = self.positions(indices)
+        labels = np.full(len(pos), '', dtype=object)
+        labels[pos >= 0] = self.df['Label'].take(pos[pos >= 0]).to_numpy(dtype=object)
+        return labels.tolist()
+
+    def _make_group(self, indices, key=None, cat=None):
+        if cat is not None:
+            return {'gid': next(self._gid), 'key': None, 'name': cat['name'], 'color': cat['color'], 'cat': cat,
+                    'indices': indices}
+        return {'gid': next(self._gid), 'key': key, 'name': self.custom_cat_names.get(key, key), 'color': None,
+                'cat': None, 'indices': indices}
+
+    def _line_start(self):
+        """第一个直线分区在 groups 中的位置"""
+        return next((i for i, g in enumerate(self.groups) if g['cat'] is None), len(self.groups))
+
+    @traced("classify")
+    def classify(self):
+        """
+        返回分类结果列表 [{'gid', 'key', 'name', 'color', 'cat', 'indices'}]：
+        先是圈选分类 (cat 指向 category_list 中的条目)，再是各直线分区 (含空分区)，
+        indices 为按显示顺序排列的行索引数组。结果缓存在 self.groups 中供增量更新。
+        """
+        self.groups = groups = []
+        if self.df.empty: return groups
+        index = self.df.index.to_numpy()
+        taken = np.zeros(len(index), dtype=bool)
+        for cat in self.category_list:
+            if not cat['indices']: continue
+            idx = np.sort(np.fromiter(cat['indices'], dtype=index.dtype, count=len(cat['indices'])))
+            taken[self.positions(idx)] = True
+            groups.append(self._make_group(idx, cat=cat))
+
+        rem = np.flatnonzero(~taken)
+        names = self.line_category_names()
+        if len(names) > 1:
+            bins = self.line_bins(self.df['Y'].to_numpy()[rem], self.df['X'].to_numpy()[rem])
+            keep = bins >= 0
+            rem, bins = rem[keep], bins[keep]
+            order = np.argsort(bins, kind='stable')
+            rem = rem[order]
+            bounds = np.searchsorted(bins[order], np.arange(len(names) + 1))
+        else:
+            bounds = np.array([0, len(rem)])
+        rem_idx = index[rem]
+        for k, key in enumerate(names):
+            groups.append(self._make_group(rem_idx[bounds[k]:bounds[k + 1]], key=key))
+        return groups
+
+    # --- 增量更新：只拆分/合并受影响的分区 ---
+    # 返回 (start, removed, added)：groups[start:start+len(removed)] 被替换为 added；
+    # 无法增量处理时重新全量分类并返回 None。横线只影响相邻 Y 区间中的一行网格；
+    # 竖线影响每个 Y 区间，直接全量分类。
+    def add_threshold(self, value, axis='y'):
+        lines = self.thresholds if axis == 'y' else self.x_thresholds
+        if value in lines: return 0, [], []
+        self._record({'kind': 'threshold', 'value': value, 'added': True, 'axis': axis})
+        k = bisect.bisect_right(lines, value)
+        had_lines = bool(lines)
+        lines.insert(k, value)
+        if axis == 'x' or not had_lines or not self.groups:
+            # 首条线需要剔除该轴为空的行 (且所有分区改名)，直接全量分类
+            self.classify()
+            return None
+        n = len(self.x_thresholds) + 1
+        g = self._line_start() + k * n
+        old = self.groups[g:g + n]
+        names = self.line_category_names()
+        cut = self.cuts([value], self.df['Y'])[0]
+        low, high = [], []
+        for j, grp in enumerate(old):
+            below = self.df['Y'].to_numpy()[self.positions(grp['indices'])] < cut
+            low.append(self._make_group(grp['indices'][below], key=names[k * n + j]))
+            high.append(self._make_group(grp['indices'][~below], key=names[(k + 1) * n + j]))
+        self.groups[g:g + n] = added = low + high
+        return g, old, added
+
+    def remove_threshold(self, value, axis='y'):
+        lines = self.thresholds if axis == 'y' else self.x_thresholds
+        if value not in lines: return 0, [], []
+        self._record({'kind': 'threshold', 'value': value, 'added': False, 'axis': axis})
+        k = lines.index(value)
+        lines.pop(k)
+        if axis == 'x' or not lines or not self.groups:
+            self.classify()
+            return None
+        n = len(self.x_thresholds) + 1
+        g = self._line_start() + k * n
+        old = self.groups[g:g + 2 * n]
+        names = self.line_category_names()
+        added = []
+        for j in range(n):
+            merged = np.concatenate([old[j]['indices'], old[n + j]['indices']])
+            merged = merged[np.argsort(self.positions(merged), kind='stable')]
+            added.append(self._make_group(merged, key=names[k * n + j]))
+        self.groups[g:g + 2 * n] = added
+        return g, old, added
+
+    def suggest_thresholds(self, k, method='jenks'):
+        """按未圈选点的 Y 分布建议至多 k 条分割线，不改动当前分类 (排序结果缓存，调整 k 时只需重新聚类)"""
+        free = self.point_category < 0
+        cache = self._split_cache
+        if cache is None or cache[0] is not self.df or not np.array_equal(cache[1], free):
+            y = self.df['Y'].to_numpy(dtype=float)[free]
+            self._split_cache = cache = (self.df, free, split_atoms(y))
+        return suggest_cuts(None, k, method, self.value_dtype(), cache[2])
+
+    def set_thresholds(self, values):
+        """整体替换分割线 (记为一步撤销) 并重新分类"""
+        values = sorted(set(values))
+        if values == self.thresholds: return 0, [], []
+        self._record({'kind': 'thresholds', 'old': list(self.thresholds), 'new': values})
+        self.thresholds = values
+        self.classify()
+        return None
+
+    # --- 手动排序：分类内的显示顺序由引擎保存 ---
+    def locate(self, idx):
+        """返回条目所在的 (分类, 位置)"""
+        for g in self.groups:
+            pos = np.flatnonzero(g['indices'] == idx)
+            if len(pos): return g, int(pos[0])
+        return None, -1
+
+    def move_rows(self, indices, step):
+        """在各自分类内上移(step=-1)/下移(step=1) 选中条目，返回被修改的分类"""
+        sel = np.asarray(list(indices))
+        touched = []
+        for g in self.groups:
+            pos = np.flatnonzero(np.isin(g['indices'], sel))
+            if not len(pos): continue
+            arr = g['indices'] = g['indices'].copy()
+            edge = 0 if step < 0 else len(arr) - 1
+            for p in (pos if step < 0 else pos[::-1]).tolist():
+                if p == edge:
+                    edge -= step
+                else:
+                    arr[p], arr[p + step] = arr[p + step], arr[p]
+                    edge = p
+            touched.append(g)
+        return touched
+
+    def move_row(self, idx, target_idx=None, target_group=None):
+        """拖拽：把条目移到 target_idx 所在位置 (或 target_group 开头)，返回被修改的分类"""
+        src, src_pos = self.locate(idx)
+        if src is None: return []
+        if target_idx is not None:
+            dest, dest_pos = self.locate(target_idx)
+            if dest is None: return []
+        else:
+            dest, dest_pos = target_group, 0
+        # 与 Treeview.move 一致：先移除再按原位置插入，同分类下移时落在目标之后
+        src['indices'] = np.delete(src['indices'], src_pos)
+        dest['indices'] = np.insert(dest['indices'], dest_pos, idx)
+        return [src] if dest is src else [src, dest]
+
+    def toggle_mark(self, idx):
+        """切换标记状态，返回切换后是否已标记；行已不存在时忽略并返回 None"""
+        if idx not in self.df.index: return None
+        self._record({'kind': 'mark', 'idx': idx})
+        m = idx not in self.marked_indices
+        if m:
+            self.marked_indices.add(idx)
+        else:
+            self.marked_indices.remove(idx)
+        self.point_marked[self.positions([idx])] = m
+        return m
+
+    def rename_group(self, group, new_name):
+        if group['cat'] is not None:
+            group['cat']['name'] = new_name
+        else:
+            self.custom_cat_names[group['key']] = new_name
+        group['name'] = new_name
+
+    def convert_labels(self, mode):
+        """批量简繁转换 Label 列：每个不同的名称只转换一次"""
+        col = self.df['Label']
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            cats, codes = col.cat.categories, col.cat.codes.to_numpy()
+        else:
+            codes, cats = pd.factorize(col)
+        converted = [convert_label(mode, c) for c in cats]
+        if isinstance(col.dtype, pd.CategoricalDtype) and len(set(converted)) == len(converted):
+            self.df['Label'] = col.cat.rename_categories(converted)
+            return
+        values = np.asarray(converted, dtype=object)[codes]
+        self.df['Label'] = pd.Categorical(values) if isinstance(col.dtype, pd.CategoricalDtype) else values
+
+    # --- 后台分类 ---
+    # 后台线程只操作快照；version 在每次修改分类状态时递增，用于判断快照是否过期。
+    def snapshot(self):
+        """共享 df，复制阈值、分类名与圈选成员的只读副本"""
+        snap = Classifier()
+        snap.df, snap._gid, snap.version = self.df, self._gid, self.version
+        snap.thresholds, snap.x_thresholds = list(self.thresholds), list(self.x_thresholds)
+        snap.custom_cat_names = dict(self.custom_cat_names)
+        snap.category_list = [dict(cat, indices=frozenset(cat['indices'])) for cat in self.category_list]
+        snap.source, snap.origin = self, self.category_list
+        return snap
+
+    def adopt_groups(self, snap):
+        """采用快照的分类结果，圈选分类指回本对象中的条目；快照已过期时返回 False"""
+        if snap.source is not self or snap.version != self.version: return False
+        cats = {id(copy): cat for copy, cat in zip(snap.category_list, snap.origin)}
+        for g in snap.groups:
+            if g['cat'] is not None: g['cat'] = cats[id(g['cat'])]
+        self.groups = snap.groups
+        return True
+
+    # --- 撤销/重做 ---
+    # 每步只记录增量：阈值、被移动的索引子集、插入/删除的行及其位置 (行 ID 稳定，无需整体快照)。
+    def clear_history(self):
+        self.undo_stack, self.redo_stack, self._history_items = deque(), [], 0
+        self.version = getattr(self, 'version', 0) + 1
+
+    @staticmethod
+    def _step_size(step):
+        size = len(step['rows']) if 'rows' in step else len(step['cat']['indices']) if 'cat' in step else 1
+        if step['kind'] == 'delete':
+            size += sum(len(taken) for _, taken in step['moved']) + len(step['marked'])
+        return size
+
+    def _record(self, step):
+        self.version += 1
+        if self._replaying: return
+        step['size'] = self._step_size(step)
+        self._history_items += step['size'] - sum(s['size'] for s in self.redo_stack)
+        self.undo_stack.append(step)
+        self.redo_stack = []
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > UNDO_LIMIT
+                                            or self._history_items > UNDO_MAX_ITEMS):
+            self._history_items -= self.undo_stack.popleft()['size']
+
+    def undo(self):
+        """撤销一步，返回 (类型, 变化)；没有可撤销的步骤时返回 None"""
+        if not self.undo_stack: return None
+        step = self.undo_stack.pop()
+        change = self._replay(step, False)
+        self.redo_stack.append(step)
+        return step['kind'], change
+
+    def redo(self):
+        if not self.redo_stack: return None
+        step = self.redo_stack.pop()
+        change = self._replay(step, True)
+        self.undo_stack.append(step)
+        return step['kind'], change
+
+    def _replay(self, step, forward):
+        """
+        正向/反向执行一步。返回值：单条阈值步骤为 add/remove_threshold 的增量结果，
+        标记步骤为 (idx, 是否已标记)，其余为 None (需全量刷新)。
+        """
+        self._replaying = True
+        try:
+            kind = step['kind']
+            if kind == 'threshold':
+                if step['added'] == forward: return self.add_threshold(step['value'], step['axis'])
+                return self.remove_threshold(step['value'], step['axis'])
+            if kind == 'thresholds':
+                self.thresholds = list(step['new'] if forward else step['old'])
+                self.classify()
+                return None
+            if kind == 'mark':
+                return step['idx'], self.toggle_mark(step['idx'])
+            if kind == 'lasso':
+                if forward:
+                    self._apply_lasso(step['cat'])
+                else:
+                    self.category_list.remove(step['cat'])
+                    for other, taken in step['moved']: other['indices'] |= taken
+                    self.rebuild_point_styles()
+                return None
+            if kind == 'insert' and forward:
+                self._insert_rows(step['position'], step['rows'])
+            elif kind == 'insert':
+                self._delete_positions(self.positions(step['rows'].index))
+            elif forward:
+                self._delete_positions(step['positions'])
+            else:
+                self._restore_rows(step['positions'], step['rows'])
+                for cat, taken in step['moved']: cat['indices'] |= taken
+                self.marked_indices |= step['marked']
+                self.rebuild_point_styles()
+            return None
+        finally:
+            self._replaying = False
+
+    def _restore_rows(self, positions, rows):
+        """把删除的行 (保留原行 ID) 放回原位置"""
+        n, k = len(self.df), len(rows)
+        order = np.empty(n + k, dtype=np.intp)
+        slots = np.zeros(n + k, dtype=bool)
+        slots[positions] = True
+        order[positions] = np.arange(n, n + k)
+        order[~slots] = np.arange(n)
+        self.df = pd.concat([self.df, self._conform(rows)]).iloc[order]
+        self.grid = None
+
+    # --- 报告 ---
+    # 每个分类一节：标题、空行，之后未标记条目各自成段、连续标记条目合为一段，段间空一行。
+    def section_parts(self, group, chunk_rows=None):
+        """
+        逐块产出分类正文 (不含标题)：每次只读取 chunk_rows 行的名称与标记，
+        分隔符放在条目之前，上一块末行的状态带到下一块
+        """
+        idx = group['indices']
+        step = chunk_rows or max(len(idx), 1)
+        first, joinable = True, False  # joinable：上一行是已标记的非空条目
+        for a in range(0, len(idx), step):
+            part = idx[a:a + step]
+            labels = np.asarray(self.labels_of(part), dtype=object)
+            keep = np.flatnonzero(labels != '')
+            if not len(keep):
+                joinable = False
+                continue
+            marked = self.point_marked[self.positions(part[keep])]
+            # 相邻且均已标记的条目之间只换行，其余之间空一行 (空标签打断标记段)
+            joined = np.r_[joinable and keep[0] == 0 and marked[0], (np.diff(keep) == 1) & marked[:-1] & marked[1:]]
+            seps = np.where(joined, "\n", "\n\n").tolist()
+            if first: seps[0] = ""
+            first, joinable = False, bool(keep[-1] == len(part) - 1 and marked[-1])
+            parts = [None] * (2 * len(keep))
+            parts[::2] = seps
+            parts[1::2] = labels[keep].tolist()
+            yield "".join(parts)
+
+    def report_section(self, group):
+        """单个分类的报告正文 (不含节后空行)"""
+        title = f"【{group['name']}】:"
+        body = "".join(self.section_parts(group))
+        return title + "\n\n" + body if body else title
+
+    @traced("report_chunks")
+    def report_chunks(self):
+        """[(分类, 片段)]：片段含节后分隔，依次拼接即为完整报告；空分类不出现"""
+        groups = [g for g in self.groups if len(g['indices'])]
+        return [(g, self.report_section(g) + ("\n\n" if i < len(groups) - 1 else "\n"))
+                for i, g in enumerate(groups)]
+
+    def report(self):
+        return "".join(text for _, text in self.report_chunks()) or "\n"
+
+    # --- 导出 ---
+    def iter_txt_export(self, chunk_rows=EXPORT_CHUNK_ROWS, convert=None):
+        """
+        纯文本导出：报告去掉分类标题，各分类之间空两行 (只有空名称的分类再多留一个空行，与原导出一致)；
+        convert 为简繁转换模式时逐块转换
+        """
+        sep = None  # 下一段分类正文之前的分隔，尚未输出条目时为 None
+        for grp in self.groups:
+            if not len(grp['indices']): continue
+            wrote = False
+            for piece in self.section_parts(grp, chunk_rows):
+                if not wrote and sep is not None: yield sep
+                wrote = True
+                yield convert_lines(convert, piece) if convert else piece
+            if wrote:
+                sep = "\n\n\n"
+            elif sep is not None:
+                sep += "\n"
+
+    def iter_table_export(self, chunk_rows=EXPORT_CHUNK_ROWS):
+        """按分类顺序逐块产出 Label/Category/Marked 表"""
+        for grp in self.groups:
+            idx = grp['indices']
+            for a in range(0, len(idx), chunk_rows):
+                part = idx[a:a + chunk_rows]
+                yield pd.DataFrame({'Label': self.labels_of(part),
+                                    'Category': grp['name'],
+                                    'Marked': self.point_marked[self.positions(part)]})
+
+    def export_txt(self, path, convert=None):
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(self.iter_txt_export(convert=convert))
+
+    def export_csv(self, path):
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            header = True
+            for frame in self.iter_table_export():
+                frame.to_csv(f, header=header, index=False)
+                header = False
+            if header: f.write("Label,Category,Marked\n")
+
+    def export_parquet(self, path):
+        schema = pa.schema([('Label', pa.string()), ('Category', pa.string()), ('Marked', pa.bool_())])
+        with pq.ParquetWriter(path, schema) as writer:
+            for frame in self.iter_table_export():
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+    # --- 项目文件 ---
+    # 格式：8 字节标识 + 8 字节头长度 + JSON 头 + 64 字节对齐的原始数组。
+    # 列存为定长类型数组，名称存为分类编码 + UTF-8 字典，分类成员与标记存为有序索引数组，
+    # 打开时各数组直接内存映射，无需逐行解析。
+    def save_session(self, path):
+        if os.path.abspath(path) == self.session_path: self._detach_session()
+        df = self.df
+        labels = df['Label'].astype('category')
+        names = [str(c).encode('utf-8') for c in labels.cat.categories]
+        arrays = {
+            'index': df.index.to_numpy(dtype=np.int64),
+            'y': df['Y'].to_numpy(dtype=self.value_dtype()),
+            'x': df['X'].to_numpy(dtype=self.value_dtype('X')),
+            'label_codes': labels.cat.codes.to_numpy(dtype=np.int32),
+            'label_offsets': np.concatenate([[0], np.cumsum([len(n) for n in names], dtype=np.int64)]),
+            'label_blob': np.frombuffer(b"".join(names), dtype=np.uint8),
+            'marked': np.sort(np.fromiter(self.marked_indices, dtype=np.int64, count=len(self.marked_indices))),
+        }
+        categories, groups = [], []
+        for i, cat in enumerate(self.category_list):
+            arrays[f'cat{i}'] = np.sort(np.fromiter(cat['indices'], dtype=np.int64, count=len(cat['indices'])))
+            categories.append({'name': cat['name'], 'color': cat['color']})
+        for i, g in enumerate(self.groups):
+            # 分类内的手动排序按显示顺序保存
+            arrays[f'group{i}'] = np.asarray(g['indices'], dtype=np.int64)
+            cat = next((c for c, item in enumerate(self.category_list) if item is g['cat']), None)
+            groups.append({'key': g['key'], 'cat': cat})
+
+        specs, offset = {}, 0
+        for name, arr in arrays.items():
+            specs[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+            offset = _align(offset + arr.nbytes)
+        header = json.dumps({'version': 1, 'thresholds': self.thresholds, 'x_thresholds': self.x_thresholds,
+                             'custom_cat_names': self.custom_cat_names,
+                             'categories': categories, 'groups': groups, 'arrays': specs},
+                            ensure_ascii=False).encode('utf-8')
+        base = _align(16 + len(header))
+        with open(path, 'wb') as f:
+            f.write(SESSION_MAGIC + len(header).to_bytes(8, 'little') + header)
+            for name, arr in arrays.items():
+                f.seek(base + specs[name]['offset'])
+                np.ascontiguousarray(arr).tofile(f)
+
+    def load_session(self, path):
+        header, base = read_session_header(path)
+
+        def array(name):
+            spec = header['arrays'][name]
+            if not spec['shape'][0]: return np.empty(spec['shape'], dtype=spec['dtype'])
+            return np.memmap(path, dtype=spec['dtype'], mode='r', offset=base + spec['offset'],
+                             shape=tuple(spec['shape']))
+
+        blob, offsets = bytes(array('label_blob')), array('label_offsets').tolist()
+        names = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        index = array('index')
+        index = pd.RangeIndex(len(index)) if np.array_equal(index, np.arange(len(index))) else pd.Index(index)
+        self.df = pd.DataFrame({'Label': pd.Categorical.from_codes(array('label_codes'), names),
+                                'Y': array('y'), 'X': array('x')}, index=index, copy=False)
+        self.thresholds = header['thresholds']
+        self.x_thresholds = header.get('x_thresholds', [])
+        self.custom_cat_names = header['custom_cat_names']
+        self.category_list = [{'name': c['name'], 'color': c['color'], 'indices': set(array(f'cat{i}').tolist())}
+                              for i, c in enumerate(header['categories'])]
+        self.marked_indices = set(array('marked').tolist())
+        self.groups = [self._make_group(array(f'group{i}'), key=g['key'],
+                                        cat=None if g['cat'] is None else self.category_list[g['cat']])
+                       for i, g in enumerate(header['groups'])]
+        self.grid = None
+        self.rebuild_point_styles()
+        self.clear_history()
+        self.session_path = os.path.abspath(path)
+
+    def _detach_session(self):
+        """把内存映射的数据复制到内存，释放对项目文件的占用 (覆盖保存前调用)"""
+        self.df = self.df.copy(deep=True)
+        for g in self.groups: g['indices'] = np.array(g['indices'])
+        self.session_path = None
+
+
+# ==========================================
+# 📥 批量数据解析
+# ==========================================
+_SEPARATORS = re.compile(r'[|\t,，]+')
+
+
+@traced("parse")
+def parse_table_text(text):
+    """
+    批量解析 "名称 | Y | X" 格式的文本 (| 制表符 , ， 均可作分隔符，多余列忽略)。
+    返回 (DataFrame, 无法解析的行号列表)，空行不计入无法解析。
+    """
+    # 整段文本一次性统一分隔符，再交给 pandas 的 C 解析器
+    text = _SEPARATORS.sub('\t', text)
+    kw = dict(sep='\t', header=None, names=['Label', 'Y', 'X'], usecols=[0, 1, 2], keep_default_na=False,
+              na_values=[''], skip_blank_lines=False, quoting=csv.QUOTE_NONE, engine='c')
+    try:
+        raw = pd.read_csv(io.StringIO(text), dtype={'Label': str, 'Y': float, 'X': float}, **kw)
+        y, x = raw['Y'], raw['X']
+    except pd.errors.ParserError:
+        # 没有任何一行凑齐 3 列 (如两列数据)：所有非空行都无法解析
+        rejected = [i + 1 for i, line in enumerate(text.split('\n')) if line.replace('\t', '').strip()]
+        return pd.DataFrame({'Label': np.empty(0, dtype=object), 'Y': np.empty(0), 'X': np.empty(0)}), rejected
+    except ValueError:
+        # 含非数字内容时退回按字符串读取再逐列转换
+        raw = pd.read_csv(io.StringIO(text), dtype=str, **kw)
+        y, x = (pd.to_numeric(raw[c].str.strip(), errors='coerce') for c in ['Y', 'X'])
+    label = raw['Label'].fillna('').str.strip()
+    ok = (y.notna() & x.notna()).to_numpy()
+    blank = ((label == '') & y.isna() & x.isna()).to_numpy()
+    rejected = (np.flatnonzero(~ok & ~blank) + 1).tolist()
+    df = pd.DataFrame({'Label': label[ok].to_numpy(), 'Y': y[ok].to_numpy(dtype=float),
+                       'X': x[ok].to_numpy(dtype=float)})
+    return df, rejected
+
+
+def detect_encoding(path):
+    """按文件开头判断编码：UTF-8 (可带 BOM) 否则按 GBK"""
+    with open(path, 'rb') as f: head = f.read(1 << 16)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gbk'
+
+
+def read_table_file(path):
+    """读取 CSV/TSV 文件，首行为表头时自动跳过"""
+    with open(path, encoding=detect_encoding(path)) as f: text = f.read()
+    df, rejected = parse_table_text(text)
+    if rejected and rejected[0] == 1: rejected = rejected[1:]
+    return df, rejected
+
+
+def compact_frame(df):
+    """名称转为分类编码，Y/X 转为 float32"""
+    return pd.DataFrame({'Label': df['Label'].astype('category'),
+                         'Y': df['Y'].to_numpy(dtype=np.float32),
+                         'X': df['X'].to_numpy(dtype=np.float32)})
+
+
+def iter_table_chunks(path, chunk_lines=CHUNK_LINES):
+    """逐块读取大文件，产出 (紧凑 DataFrame, 无法解析的行号)，内存只保留当前块的文本"""
+    with open(path, encoding=detect_encoding(path)) as f:
+        offset = 0
+        while True:
+            lines = list(itertools.islice(f, chunk_lines))
+            if not lines: break
+            df, rejected = parse_table_text("".join(lines))
+            if offset == 0 and rejected and rejected[0] == 1: rejected = rejected[1:]
+            yield compact_frame(df), [offset + r for r in rejected]
+            offset += len(lines)
+
+
+# ==========================================
+# 🀄 简繁转换
+# ==========================================
+_converters = {}
+
+
+def get_converter(mode):
+    """每种转换模式只创建一个 OpenCC 实例"""
+    if mode not in _converters: _converters[mode] = opencc.OpenCC(mode)
+    return _converters[mode]
+
+
+@lru_cache(maxsize=CONVERT_CACHE_SIZE)
+def convert_label(mode, text):
+    return get_converter(mode).convert(text)
+
+
+def convert_lines(mode, text):
+    """逐行转换，重复的行直接命中缓存"""
+    return "\n".join([convert_label(mode, line) for line in text.split("\n")])
 
 
 # ==========================================
@@ -72,25 +1198,129 @@ class DataClassifierApp:
         self.setup_modern_theme()
 
         self.current_font_size = 11
-        self.df = pd.DataFrame(columns=['Label', 'Y', 'X'])
-        self.thresholds = []
-        self.category_list = []
-        self.marked_indices = set()
-        self.custom_cat_names = {}
+        # 分类树与报告共用的命名字体：改字号只需调整字体本身，已有条目与标签自动跟随
+        self.content_font = tkfont.Font(root=self.root, family="Microsoft YaHei", size=self.current_font_size)
+        self.bold_font = tkfont.Font(root=self.root, size=self.current_font_size, weight="bold")
+        self.color_tags = set()
+        self.clf = Classifier()
+        self.tree_groups = {}
+        self.report_gids = []
+        # 报告文本框当前套用的简繁转换 (只转换了报告、未转换数据时)，导出 TXT 时同样转换
+        self.report_convert_mode = None
         self.drag_source_item = None
 
+        # 虚拟化分类树状态
+        self.virtual_tree = False
+        self.vt_top = 0
+        self.vt_closed = set()
+        self.vt_window = set()
+        self.vt_selection = set()
+        self.tree_row_height = int(self.current_font_size * 2.5)
+
         self.enable_lasso_mode = tk.BooleanVar(value=False)
+        self.label_lod = tk.BooleanVar(value=True)
+        self.convert_data_labels = tk.BooleanVar(value=False)
+        self.trace_enabled = tk.BooleanVar(value=False)
+        self.trace_panel_job = None  # 性能面板定时刷新的 after id，保证同时只有一个刷新循环
+        self.label_recull_pending = False
+        # 待刷新的界面层，同一轮事件中的多次请求合并为一次 after_idle 刷新
+        self.dirty_layers = set()
+        self.dirty_sections = {}
+        self.refresh_pending = False
+        self.density_points = tk.IntVar(value=DENSITY_MODE_POINTS)
+        self.split_method = tk.StringVar(value=next(iter(AUTO_SPLIT_METHODS)))
+        self.split_count = tk.IntVar(value=3)
         self.color_cycle = ['#E74C3C', '#2ECC71', '#F39C12', '#9B59B6', '#3498DB', '#1ABC9C']
         self.lasso = None
 
+        # 常驻绘图图元：数据不变时只更新样式，不再整体重建
+        self.plot_df = None
+        self.plot_positions = np.empty(0, dtype=np.int64)
+        self.scatter = None
+        self.density_mode = False
+        self.density_image = None
+        self.density_positions = np.empty(0, dtype=np.int64)
+        self.point_labels = []
+        self.mark_labels = {}
+        self.threshold_artists = {}
+        self.split_artists = []
+        self.plot_background = None
+
+        # 后台任务：每类任务只保留最新一次提交，结果经队列交回主线程
+        self.executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="fl-worker")
+        self.jobs = {}
+        self.job_generation = {}
+        self.job_results = queue.Queue()
+        self.job_poll_pending = False
+
         # --- 现代化界面布局 ---
         self.create_main_layout()
         
         # 初始化各个模块
         self.setup_left_panel()
         self.setup_results_tab()
-        self.setup_plot_tab()
         self.apply_font_style()
+        # 绘图页依赖 matplotlib，窗口先显示出来再建立
+        self.root.after_idle(self.setup_plot_tab)
+
+        for seq in ("<Control-z>", "<Control-Z>"): self.root.bind(seq, self.on_undo_key)
+        for seq in ("<Control-y>", "<Control-Y>"): self.root.bind(seq, self.on_redo_key)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # 正在运行的任务无法强行停止：作废所有任务，让 cancellable 包装的迭代尽快结束，退出时不必等它读完
+        for kind in self.job_generation: self.job_generation[kind] += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
+    # ===============================================
+    # ⏳ 后台任务
+    # ===============================================
+    def run_in_background(self, kind, work, done):
+        """
+        在工作线程执行 work()，完成后在主线程调用 done(结果)。
+        同类任务再次提交时旧任务作废：未开始的直接取消，已在运行的结果被丢弃。
+        """
+        gen = self.job_generation[kind] = self.job_generation.get(kind, 0) + 1
+        old = self.jobs.get(kind)
+        if old is not None: old.cancel()
+        self.jobs[kind] = future = self.executor.submit(work)
+        future.add_done_callback(lambda f: self.job_results.put((kind, gen, f, done)))
+        self.root.configure(cursor="watch")
+        if not self.job_poll_pending:
+            self.job_poll_pending = True
+            self.root.after(JOB_POLL_MS, self.poll_background_jobs)
+
+    def job_is_current(self, kind, gen):
+        return self.job_generation.get(kind) == gen
+
+    def cancellable(self, kind, items):
+        """包装随后提交的同类任务中的长时间迭代：该任务被新提交取代后提前结束"""
+        gen = self.job_generation.get(kind, 0) + 1
+        return itertools.takewhile(lambda _: self.job_is_current(kind, gen), items)
+
+    def poll_background_jobs(self):
+        try:
+            while True:
+                try:
+                    kind, gen, future, done = self.job_results.get_nowait()
+                except queue.Empty:
+                    break
+                if not self.job_is_current(kind, gen): continue
+                del self.jobs[kind]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    messagebox.showerror("处理失败", f"后台任务出错：{e}")
+                    continue
+                done(result)
+        finally:
+            # done() 出错时也要继续轮询，否则之后的结果不再送达、光标一直是等待状态
+            if self.jobs:
+                self.root.after(JOB_POLL_MS, self.poll_background_jobs)
+            else:
+                self.job_poll_pending = False
+                self.root.configure(cursor="")
 
     def setup_window_style(self):
         """设置窗口样式"""
@@ -235,6 +1465,10 @@ class DataClassifierApp:
                                               "📋 粘贴并解析数据", 
                                               self.load_from_text,
                                               THEME_COLORS['primary'])
+        self.create_modern_button(import_card,
+                                  "📂 打开 CSV/TSV 文件",
+                                  self.load_from_file,
+                                  THEME_COLORS['primary'])
 
         # 2. 交互模式 - 现代化卡片
         mode_card = self.create_card(scrollable_frame, "🎮 绘图模式", THEME_COLORS['accent'])
@@ -243,7 +1477,7 @@ class DataClassifierApp:
         mode_frame.pack(fill=tk.X, pady=5)
         
         tk.Radiobutton(mode_frame, 
-                      text="🖱️ 直线模式 (左键加线/右键删线)", 
+                      text="🖱️ 直线模式 (左键加横线/Shift+左键加竖线/右键删线)", 
                       variable=self.enable_lasso_mode, 
                       value=False,
                       command=self.update_plot_view,
@@ -260,9 +1494,75 @@ class DataClassifierApp:
                       font=('Microsoft YaHei', 9),
                       activebackground=THEME_COLORS['hover']).pack(anchor="w", pady=2)
 
+        tk.Checkbutton(mode_frame,
+                       text="🏷️ 标签分层显示 (按视野稀疏标注)",
+                       variable=self.label_lod,
+                       command=self.on_label_lod_change,
+                       bg='white',
+                       font=('Microsoft YaHei', 9),
+                       activebackground=THEME_COLORS['hover']).pack(anchor="w", pady=2)
+
+        density_frame = tk.Frame(mode_frame, bg='white')
+        density_frame.pack(anchor="w", pady=2)
+        tk.Label(density_frame, text="🌫️ 超过", bg='white', font=('Microsoft YaHei', 9)).pack(side=tk.LEFT)
+        density_spin = ttk.Spinbox(density_frame, from_=1000, to=100000000, increment=10000, width=10,
+                                   textvariable=self.density_points, command=self.on_density_points_change)
+        density_spin.pack(side=tk.LEFT, padx=3)
+        density_spin.bind("<Return>", self.on_density_points_change)
+        density_spin.bind("<FocusOut>", self.on_density_points_change)
+        tk.Label(density_frame, text="点时聚合显示", bg='white', font=('Microsoft YaHei', 9)).pack(side=tk.LEFT)
+
+        # 自动分割：调整方法或条数时在图上预览建议的分割线，确认后替换现有分割线
+        split_frame = tk.Frame(mode_card, bg='white')
+        split_frame.pack(anchor="w", pady=(8, 2))
+        tk.Label(split_frame, text="📏 自动分割", bg='white', font=('Microsoft YaHei', 9)).pack(side=tk.LEFT)
+        split_combo = ttk.Combobox(split_frame, values=list(AUTO_SPLIT_METHODS), textvariable=self.split_method,
+                                   width=8, state="readonly", style='Modern.TCombobox')
+        split_combo.pack(side=tk.LEFT, padx=3)
+        split_combo.bind("<<ComboboxSelected>>", self.preview_auto_split)
+        split_spin = ttk.Spinbox(split_frame, from_=1, to=AUTO_SPLIT_MAX, width=4,
+                                 textvariable=self.split_count, command=self.preview_auto_split)
+        split_spin.pack(side=tk.LEFT, padx=3)
+        split_spin.bind("<Return>", self.preview_auto_split)
+        tk.Label(split_frame, text="条", bg='white', font=('Microsoft YaHei', 9)).pack(side=tk.LEFT)
+        self.split_label = tk.Label(mode_card, text="", bg='white', fg=THEME_COLORS['text_secondary'],
+                                    font=('Microsoft YaHei', 9), wraplength=260, justify=tk.LEFT)
+        self.split_label.pack(anchor="w")
+        self.create_modern_button(mode_card,
+                                  "✂️ 应用自动分割",
+                                  self.apply_auto_split,
+                                  THEME_COLORS['accent'])
+
         # 3. 操作区 - 现代化卡片
         action_card = self.create_card(scrollable_frame, "🔧 操作区", THEME_COLORS['success'])
         
+        self.create_modern_button(action_card,
+                                  "💾 保存项目",
+                                  self.save_session,
+                                  THEME_COLORS['success'])
+        self.create_modern_button(action_card,
+                                  "📂 打开项目",
+                                  self.open_session,
+                                  THEME_COLORS['success'])
+        self.create_modern_button(action_card,
+                                  "↶ 撤销 (Ctrl+Z)",
+                                  self.undo,
+                                  THEME_COLORS['secondary'])
+        self.create_modern_button(action_card,
+                                  "↷ 重做 (Ctrl+Y)",
+                                  self.redo,
+                                  THEME_COLORS['secondary'])
+        tk.Checkbutton(action_card,
+                       text="⏱️ 记录性能统计",
+                       variable=self.trace_enabled,
+                       command=self.on_trace_toggle,
+                       bg='white',
+                       font=('Microsoft YaHei', 9),
+                       activebackground=THEME_COLORS['hover']).pack(anchor="w", padx=15, pady=2)
+        self.create_modern_button(action_card,
+                                  "📈 导出性能记录",
+                                  self.export_trace,
+                                  THEME_COLORS['secondary'])
         reset_btn = self.create_modern_button(action_card, 
                                              "🗑️ 清空所有数据", 
                                              self.reset_all,
@@ -384,17 +1684,23 @@ class DataClassifierApp:
         self.tree.column('Status', width=100)
         
         # 添加滚动条
-        tree_scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=tree_scroll.set)
+        self.tree_scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.tree_scroll.set)
         
         self.tree.pack(side="left", fill="both", expand=True)
-        tree_scroll.pack(side="right", fill="y")
+        self.tree_scroll.pack(side="right", fill="y")
 
         # 绑定事件
         self.tree.bind("<ButtonPress-1>", self.on_drag_start)
         self.tree.bind("<B1-Motion>", self.on_drag_motion)
         self.tree.bind("<ButtonRelease-1>", self.on_drag_release)
         self.tree.bind("<Button-3>", self.on_right_click)
+        self.tree.bind("<<TreeviewOpen>>", self.on_vtree_toggle)
+        self.tree.bind("<<TreeviewClose>>", self.on_vtree_toggle)
+        self.tree.bind("<MouseWheel>", self.on_vtree_wheel)
+        self.tree.bind("<Button-4>", self.on_vtree_wheel)
+        self.tree.bind("<Button-5>", self.on_vtree_wheel)
+        self.tree.bind("<Configure>", lambda e: self.virtual_tree and self.render_virtual_tree())
 
         # --- 报告页面 ---
         self.tab_report = tk.Frame(self.inner_nb, bg='white')
@@ -409,10 +1715,17 @@ class DataClassifierApp:
         report_btn_frame.pack(side=tk.LEFT, padx=10, pady=10)
         
         self.create_toolbar_button(report_btn_frame, "💾 导出 TXT", self.export_txt_file, THEME_COLORS['primary'])
+        self.create_toolbar_button(report_btn_frame, "📊 导出表格", self.export_table_file, THEME_COLORS['primary'])
         
         if HAS_OPENCC:
             self.create_toolbar_button(report_btn_frame, "繁→简", self.convert_to_simplified, THEME_COLORS['secondary'])
             self.create_toolbar_button(report_btn_frame, "简→繁", self.convert_to_traditional, THEME_COLORS['secondary'])
+            tk.Checkbutton(report_btn_frame,
+                           text="同时转换数据名称",
+                           variable=self.convert_data_labels,
+                           bg=THEME_COLORS['bg_light'],
+                           font=('Microsoft YaHei', 9),
+                           activebackground=THEME_COLORS['hover']).pack(side=tk.LEFT, padx=5)
         
         # 文本编辑区
         text_frame = tk.Frame(self.tab_report, bg='white')
@@ -424,7 +1737,7 @@ class DataClassifierApp:
                                   bd=1,
                                   highlightthickness=1,
                                   highlightcolor=THEME_COLORS['primary'],
-                                  font=('Microsoft YaHei', 11),
+                                  font=self.content_font,
                                   wrap=tk.WORD)
         
         # 文本区滚动条
@@ -462,6 +1775,7 @@ class DataClassifierApp:
 
     def setup_plot_tab(self):
         """设置现代化绘图标签页"""
+        load_plotting()
         # 创建绘图容器
         plot_container = tk.Frame(self.tab_plt, bg='white')
         plot_container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -493,7 +1807,15 @@ class DataClassifierApp:
                                    bg=THEME_COLORS['bg_light'],
                                    fg=THEME_COLORS['text_secondary'],
                                    font=('Microsoft YaHei', 9))
-        self.stats_label.pack()
+        self.stats_label.pack(side=tk.RIGHT)
+
+        # 性能统计 (开启记录时显示在统计信息左侧)
+        self.trace_label = tk.Label(stats_frame,
+                                   text="",
+                                   bg=THEME_COLORS['bg_light'],
+                                   fg=THEME_COLORS['secondary'],
+                                   font=('Microsoft YaHei', 9))
+        if self.trace_enabled.get(): self.trace_label.pack(side=tk.RIGHT, padx=(0, 15))
         
         # 创建matplotlib图形
         self.fig, self.ax = plt.subplots(figsize=(8, 6), dpi=100)
@@ -506,13 +1828,26 @@ class DataClassifierApp:
         self.ax.spines['right'].set_visible(False)
         self.ax.spines['left'].set_color('#CCCCCC')
         self.ax.spines['bottom'].set_color('#CCCCCC')
+        self.ax.tick_params(colors='#666666')
+        self.ax.set_title("📈 数据可视化交互区", fontsize=14, fontweight='bold', pad=20)
+        self.ax.set_xlabel('X 轴数值', fontsize=12, color='#2C3E50')
+        self.ax.set_ylabel('Y 轴数值', fontsize=12, color='#2C3E50')
+
+        # 标记点画在动态图元层，切换标记时只需 blit
+        self.mark_scatter = self.ax.scatter([], [], c='#E74C3C', s=150, alpha=1.0, zorder=6,
+                                            edgecolors='white', linewidth=1.5, animated=True)
         
-        # 创建画布
+        # 创建画布 (完整重绘计入性能记录)
         self.canvas = FigureCanvasTkAgg(self.fig, master=plot_container)
+        self.canvas.draw = traced("canvas.draw")(self.canvas.draw)
         self.canvas.mpl_connect('button_press_event', self.on_plot_click)
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.canvas.mpl_connect('resize_event', self.schedule_view_update)
+        self.ax.callbacks.connect('xlim_changed', self.schedule_view_update)
+        self.ax.callbacks.connect('ylim_changed', self.schedule_view_update)
         
         # 添加matplotlib工具栏
-        toolbar = NavigationToolbar2Tk(self.canvas, plot_container)
+        self.toolbar = toolbar = NavigationToolbar2Tk(self.canvas, plot_container)
         toolbar.update()
         
         # 自定义工具栏样式
@@ -531,12 +1866,47 @@ class DataClassifierApp:
         else:
             self.mode_indicator.configure(text="🖱️ 直线模式", bg=THEME_COLORS['primary'])
     
+    # --- 性能统计 ---
+    def on_trace_toggle(self):
+        TRACER.enabled = self.trace_enabled.get()
+        if not hasattr(self, 'trace_label'): return
+        if TRACER.enabled:
+            TRACER.reset()
+            self.trace_label.pack(side=tk.RIGHT, padx=(0, 15))
+            self.update_trace_panel()
+        else:
+            self.trace_label.pack_forget()
+            if self.trace_panel_job is not None:
+                self.root.after_cancel(self.trace_panel_job)
+                self.trace_panel_job = None
+
+    def update_trace_panel(self):
+        """显示各阶段最近一次耗时与计数器，开启期间定时刷新"""
+        self.trace_panel_job = None
+        if not TRACER.enabled: return
+        parts = [f"{title} {TRACER.last[name] * 1000:.0f}ms" for title, name in TRACE_PANEL_STAGES
+                 if name in TRACER.last]
+        counters = TRACER.counters
+        if counters:
+            parts.append(f"树行 {counters.get('tree.rows_inserted', 0)} | 图元 {counters.get('plot.artists_created', 0)}")
+        self.trace_label.configure(text="⏱️ " + (" · ".join(parts) or "等待操作…"))
+        self.trace_panel_job = self.root.after(TRACE_PANEL_MS, self.update_trace_panel)
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON 文件", "*.json"), ("CSV 文件", "*.csv")])
+        if not path: return
+        if path.lower().endswith(".csv"):
+            TRACER.dump_csv(path)
+        else:
+            TRACER.dump_json(path)
+
     def update_stats_display(self):
         """更新统计信息显示"""
-        data_count = len(self.df)
-        threshold_count = len(self.thresholds)
-        category_count = len(self.category_list)
-        marked_count = len(self.marked_indices)
+        data_count = len(self.clf.df)
+        threshold_count = len(self.clf.thresholds) + len(self.clf.x_thresholds)
+        category_count = len(self.clf.category_list)
+        marked_count = len(self.clf.marked_indices)
         
         stats_text = f"数据点: {data_count} | 分类线: {threshold_count} | 圈选组: {category_count} | 标记: {marked_count}"
         self.stats_label.configure(text=stats_text)
@@ -545,23 +1915,28 @@ class DataClassifierApp:
     # 🔼 🔽 上移/下移
     # ===============================================
     def move_item_up(self):
-        selected = self.tree.selection()
-        for item in selected:
-            parent = self.tree.parent(item)
-            if parent:
-                idx = self.tree.index(item)
-                if idx > 0: self.tree.move(item, parent, idx - 1)
-        self.generate_report_from_tree()
+        self.reorder_tree_groups(self.clf.move_rows(self.selected_row_indices(), -1))
 
     def move_item_down(self):
-        selected = reversed(self.tree.selection())
-        for item in selected:
-            parent = self.tree.parent(item)
-            if parent:
-                idx = self.tree.index(item)
-                siblings = self.tree.get_children(parent)
-                if idx < len(siblings) - 1: self.tree.move(item, parent, idx + 1)
-        self.generate_report_from_tree()
+        self.reorder_tree_groups(self.clf.move_rows(self.selected_row_indices(), 1))
+
+    def reorder_tree_groups(self, groups):
+        """引擎中的顺序变化后，同步被修改分类的树节点"""
+        if not groups: return
+        if self.tree_rebuild_pending():
+            return
+        if self.virtual_tree:
+            self.render_virtual_tree()
+        else:
+            # 先重排非空分类 (可能把条目从其它分类移入)，再删除已空的分类
+            for grp in sorted(groups, key=lambda g: not len(g['indices'])):
+                pid = f"grp{grp['gid']}"
+                if len(grp['indices']):
+                    self.tree.set_children(pid, *[f"row{i}" for i in grp['indices'].tolist()])
+                else:
+                    self.tree.delete(pid)
+                    del self.tree_groups[pid]
+        self.schedule_refresh(sections=groups)
 
     # ===============================================
     # ➕ 插入新增逻辑
@@ -595,15 +1970,14 @@ class DataClassifierApp:
         content_frame.pack(fill=tk.BOTH, expand=True, padx=30, pady=30)
         
         # 获取默认值
-        default_y, default_x, insert_pos = "", "", len(self.df)
-        selected = self.tree.selection()
-        if selected and self.tree.parent(selected[0]):
-            vals = self.tree.item(selected[0], 'values')
-            row_idx = int(vals[2])
-            if row_idx in self.df.index:
-                default_y = str(self.df.loc[row_idx, 'Y'] + 1)
-                default_x = str(self.df.loc[row_idx, 'X'])
-                insert_pos = self.df.index.get_loc(row_idx) + 1
+        default_y, default_x, insert_pos = "", "", len(self.clf.df)
+        selected = self.selected_row_indices()
+        if selected:
+            row_idx = selected[0]
+            if row_idx in self.clf.df.index:
+                default_y = str(self.clf.df.loc[row_idx, 'Y'] + 1)
+                default_x = str(self.clf.df.loc[row_idx, 'X'])
+                insert_pos = self.clf.df.index.get_loc(row_idx) + 1
         
         # 输入字段
         fields = [
@@ -645,8 +2019,7 @@ class DataClassifierApp:
                 x_val = float(entries[2].get())
                 
                 row = pd.DataFrame([[name, y_val, x_val]], columns=['Label', 'Y', 'X'])
-                self.df = pd.concat([self.df.iloc[:insert_pos], row, self.df.iloc[insert_pos:]]).reset_index(drop=True)
-                self.category_list, self.marked_indices = [], set()
+                self.clf.insert_rows(insert_pos, row)
                 self.refresh_all()
                 dialog.destroy()
             except ValueError:
@@ -704,14 +2077,110 @@ class DataClassifierApp:
         if not self.drag_source_item: return
         target = self.tree.identify_row(event.y)
         if target and target != self.drag_source_item:
-            dest_p = self.tree.parent(target) or target
-            try:
-                self.tree.move(self.drag_source_item, dest_p, self.tree.index(target))
-                self.generate_report_from_tree()
-            except:
-                pass
+            src_idx = self.row_index_of(self.drag_source_item)
+            if self.tree.parent(target):
+                touched = self.clf.move_row(src_idx, target_idx=self.row_index_of(target))
+            else:
+                touched = self.clf.move_row(src_idx, target_group=self.tree_groups.get(target))
+            self.reorder_tree_groups(touched)
         self.drag_source_item = None
 
+    # ===============================================
+    # 🌲 虚拟化分类树 (大数据量时只生成可见窗口)
+    # ===============================================
+    def row_index_of(self, iid):
+        return int(iid[3:])
+
+    def selected_row_indices(self):
+        """选中条目的行索引 (虚拟模式下包含已滚出窗口的选中项)"""
+        items = self.tree.selection()
+        if self.virtual_tree:
+            items = list(items) + sorted(self.vt_selection - self.vt_window - set(items))
+        return [self.row_index_of(i) for i in items if i.startswith("row")]
+
+    def configure_tree_mode(self):
+        self.virtual_tree = len(self.clf.df) > VIRTUAL_TREE_THRESHOLD
+        if self.virtual_tree:
+            self.tree.configure(yscrollcommand="")
+            self.tree_scroll.configure(command=self.on_vtree_scroll)
+        else:
+            self.vt_window, self.vt_selection = set(), set()
+            self.tree.configure(yscrollcommand=self.tree_scroll.set)
+            self.tree_scroll.configure(command=self.tree.yview)
+
+    def vtree_layout(self):
+        """返回可见分类及每个分类在虚拟行序列中的起始行"""
+        groups = [g for g in self.clf.groups if len(g['indices'])]
+        sizes = [1 + (0 if g['name'] in self.vt_closed else len(g['indices'])) for g in groups]
+        return groups, np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+    def vtree_visible_rows(self):
+        return max(1, self.tree.winfo_height() // self.tree_row_height - 1)
+
+    @traced("render_virtual_tree")
+    def render_virtual_tree(self):
+        """只插入当前滚动窗口内的分类与条目，窗口开头所在分类的标题始终显示"""
+        current = set(self.tree.selection())
+        self.vt_selection = (self.vt_selection - self.vt_window) | current
+        for i in self.tree.get_children(): self.tree.delete(i)
+        self.tree_groups, self.vt_window = {}, set()
+        groups, starts = self.vtree_layout()
+        total, visible = int(starts[-1]), self.vtree_visible_rows()
+        self.vt_top = top = max(0, min(self.vt_top, total - visible))
+        end = top + visible
+        gi = int(np.searchsorted(starts, top, side='right')) - 1
+        marked = self.clf.marked_indices
+        while gi < len(groups) and starts[gi] < end:
+            grp, first = groups[gi], int(starts[gi])
+            opened = grp['name'] not in self.vt_closed
+            pid = self.tree.insert("", "end", iid=f"grp{grp['gid']}", text=f"📂 {grp['name']}", open=opened,
+                                   tags=self.color_tag(grp['color']))
+            self.tree_groups[pid] = grp
+            if opened:
+                rows = grp['indices'][max(0, top - first - 1):max(0, end - first - 1)]
+                TRACER.count("tree.rows_inserted", len(rows))
+                for idx, label in zip(rows.tolist(), self.clf.labels_of(rows)):
+                    m = idx in marked
+                    iid = self.tree.insert(pid, "end", iid=f"row{idx}", values=(label, "✅ 标记" if m else "", idx),
+                                           tags=('marked' if m else ''))
+                    self.vt_window.add(iid)
+            gi += 1
+        keep = [i for i in self.vt_selection if i in self.vt_window or i in self.tree_groups]
+        if keep: self.tree.selection_set(keep)
+        if total:
+            self.tree_scroll.set(top / total, min(1.0, end / total))
+        else:
+            self.tree_scroll.set(0, 1)
+
+    def on_vtree_scroll(self, *args):
+        _, starts = self.vtree_layout()
+        total, visible = int(starts[-1]), self.vtree_visible_rows()
+        if args[0] == 'moveto':
+            self.vt_top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = visible if args[2] == 'pages' else 1
+            self.vt_top += int(args[1]) * step
+        self.render_virtual_tree()
+
+    def on_vtree_wheel(self, event):
+        if not self.virtual_tree: return
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.vt_top -= 3
+        else:
+            self.vt_top += 3
+        self.render_virtual_tree()
+        return "break"
+
+    def on_vtree_toggle(self, event):
+        if not self.virtual_tree: return
+        grp = self.tree_groups.get(self.tree.focus())
+        if grp is None: return
+        if grp['name'] in self.vt_closed:
+            self.vt_closed.discard(grp['name'])
+        else:
+            self.vt_closed.add(grp['name'])
+        self.root.after_idle(self.render_virtual_tree)
+
     # ===============================================
     # 🎯 绘图与交互
     # ===============================================
@@ -719,242 +2188,641 @@ class DataClassifierApp:
         if event.inaxes != self.ax: return
         if not self.enable_lasso_mode.get():
             if event.button == 1:
-                val = round(event.ydata, 1)
-                if val not in self.thresholds: self.thresholds.append(val); self.thresholds.sort(); self.refresh_all()
-            elif event.button == 3 and self.thresholds:
-                closest = min(self.thresholds, key=lambda x: abs(x - event.ydata))
-                if abs(closest - event.ydata) < (self.ax.get_ylim()[1] - self.ax.get_ylim()[0]) * 0.05:
-                    self.thresholds.remove(closest);
-                    self.refresh_all()
+                axis, val = ('x', round(event.xdata, 1)) if event.key == 'shift' else ('y', round(event.ydata, 1))
+                self.apply_group_change(self.clf.add_threshold(val, axis))
+            elif event.button == 3:
+                # 删除离点击处最近的分割线 (按视野比例比较横线与竖线的距离)
+                (y0, y1), (x0, x1) = self.ax.get_ylim(), self.ax.get_xlim()
+                near = [(abs(v - event.ydata) / abs(y1 - y0), 'y', v) for v in self.clf.thresholds]
+                near += [(abs(v - event.xdata) / abs(x1 - x0), 'x', v) for v in self.clf.x_thresholds]
+                if near and min(near)[0] < 0.05:
+                    _, axis, val = min(near)
+                    self.apply_group_change(self.clf.remove_threshold(val, axis))
+
+    # --- 自动分割 ---
+    def current_split(self):
+        """按界面上的方法与条数计算建议的分割线"""
+        try:
+            k = min(max(self.split_count.get(), 1), AUTO_SPLIT_MAX)
+        except tk.TclError:
+            k = 3
+        self.split_count.set(k)
+        if self.clf.df.empty: return []
+        return self.clf.suggest_thresholds(k, AUTO_SPLIT_METHODS[self.split_method.get()])
+
+    def preview_auto_split(self, *args):
+        self.show_split_preview(self.current_split())
+        self.blit_plot()
+
+    def show_split_preview(self, values):
+        """预览线放在动态图元层，增删时无需完整重绘"""
+        for line in self.split_artists: line.remove()
+        self.split_artists = [self.ax.axhline(y=v, color=THEME_COLORS['accent'], linestyle=':', linewidth=2,
+                                              alpha=0.9, animated=True) for v in values]
+        self.split_label.config(text=f"建议：{', '.join(map(str, values))}" if values else "")
+
+    def apply_auto_split(self):
+        values = self.current_split()
+        self.show_split_preview([])
+        self.blit_plot()
+        if values: self.apply_group_change(self.clf.set_thresholds(values))
 
     def on_lasso_select(self, verts):
-        if self.df.empty: return
-        path = Path(verts)
-        inside = path.contains_points(self.df[['X', 'Y']].values)
-        new_idx = set(self.df.index[inside].tolist())
+        new_idx = self.clf.lasso_select(verts)
         if new_idx:
-            for cat in self.category_list: cat['indices'] -= new_idx
-            cat_id = len(self.category_list) + 1
-            self.category_list.append({'name': f"圈选提取 {cat_id}", 'indices': new_idx,
-                                       'color': self.color_cycle[(cat_id - 1) % len(self.color_cycle)]})
+            color = self.color_cycle[len(self.clf.category_list) % len(self.color_cycle)]
+            self.clf.add_lasso_category(new_idx, color)
             self.refresh_all()
 
+    @traced("update_plot_view")
     def update_plot_view(self):
-        self.ax.clear()
-        self.ax.set_title("📈 数据可视化交互区", fontsize=14, fontweight='bold', pad=20)
-        self.ax.set_facecolor('#FAFAFA')
-        self.ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
-        
-        if not self.df.empty:
-            colors = ['#3498DB'] * len(self.df)
-            sizes = [80] * len(self.df)
-            alphas = [0.7] * len(self.df)
-            
-            # 设置点的颜色和大小
-            for i in self.df.index:
-                if i in self.marked_indices:
-                    colors[i], sizes[i], alphas[i] = '#E74C3C', 150, 1.0
-                else:
-                    for cat in self.category_list:
-                        if i in cat['indices']:
-                            colors[i], sizes[i], alphas[i] = cat['color'], 120, 0.8
-                            break
-            
-            # 绘制散点图
-            scatter = self.ax.scatter(self.df['X'], self.df['Y'], 
-                                    c=colors, s=sizes, alpha=alphas, 
-                                    zorder=5, edgecolors='white', linewidth=1.5)
-            
-            # 添加数据标签
-            for idx, row in self.df.iterrows():
-                is_marked = idx in self.marked_indices
-                self.ax.annotate(row['Label'], 
-                               (row['X'], row['Y']), 
-                               xytext=(0, 8), 
-                               textcoords="offset points",
-                               ha='center', 
-                               fontsize=9, 
-                               color='#E74C3C' if is_marked else '#2C3E50',
-                               weight='bold' if is_marked else 'normal',
-                               bbox=dict(boxstyle="round,pad=0.3", 
-                                       facecolor='white' if not is_marked else '#E74C3C',
-                                       edgecolor='none',
-                                       alpha=0.8))
-        
-        # 绘制分类线
-        for y in self.thresholds:
-            self.ax.axhline(y=y, color=THEME_COLORS['primary'], 
-                          linestyle='--', alpha=0.8, linewidth=2)
-            self.ax.text(self.ax.get_xlim()[1], y, f' {y}', 
-                        verticalalignment='center',
-                        bbox=dict(boxstyle="round,pad=0.2", 
-                                facecolor=THEME_COLORS['primary'], 
-                                alpha=0.8),
-                        color='white', fontweight='bold')
-        
-        # 设置坐标轴样式
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.ax.spines['left'].set_color('#CCCCCC')
-        self.ax.spines['bottom'].set_color('#CCCCCC')
-        self.ax.tick_params(colors='#666666')
-        
-        # 设置标签
-        self.ax.set_xlabel('X 轴数值', fontsize=12, color='#2C3E50')
-        self.ax.set_ylabel('Y 轴数值', fontsize=12, color='#2C3E50')
-        
-        # 圈选模式
-        if self.enable_lasso_mode.get():
-            self.lasso = LassoSelector(self.ax, onselect=self.on_lasso_select, 
-                                     props={'color': THEME_COLORS['accent'], 'linewidth': 2})
-        else:
-            if self.lasso:
-                self.lasso.set_active(False)
-                self.lasso = None
-        
+        """同步整个绘图：数据变化时重建散点，其余只更新已有图元"""
+        if self.clf.df is not self.plot_df:
+            self.rebuild_scatter()
+        self.update_point_styles()
+        self.sync_threshold_lines()
+        self.sync_marks()
+        self.recull_labels()
+        self.sync_lasso()
+
         # 更新界面指示器
         self.update_mode_indicator()
         self.update_stats_display()
-        
-        self.canvas.draw()
+        self.request_plot_redraw()
 
-    def classify_and_display(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        if self.df.empty: return
-        cat_idx = set()
-        for i, cat in enumerate(self.category_list):
-            if not cat['indices']: continue
-            tag = f"tag_{cat['color']}"
-            self.tree.tag_configure(tag, foreground=cat['color'], font=("", self.current_font_size, "bold"))
-            pid = self.tree.insert("", "end", text=f"📂 {cat['name']}", open=True, tags=(tag,))
-            for idx in sorted(list(cat['indices'])):
-                m = idx in self.marked_indices
-                self.tree.insert(pid, "end", values=(self.df.loc[idx, 'Label'], "✅ 标记" if m else "", idx),
-                                 tags=('marked' if m else ''))
-                cat_idx.add(idx)
-        rem_df = self.df.drop(list(cat_idx))
-        if not rem_df.empty:
-            t_sorted = sorted(self.thresholds)
-            line_cats = []
-            if not t_sorted:
-                line_cats.append(("数据区", rem_df))
+    def rebuild_scatter(self):
+        """数据集变化：重建散点与标签图元并重新缩放坐标轴"""
+        if self.scatter is not None: self.scatter.remove()
+        if self.density_image is not None: self.density_image.remove()
+        for ann in self.point_labels: ann.remove()
+        for ann in self.mark_labels.values(): ann.remove()
+        self.scatter, self.density_image, self.point_labels, self.mark_labels = None, None, [], {}
+        self.show_split_preview([])
+        self.plot_df = df = self.clf.df
+        self.plot_positions = np.arange(len(df))
+        self.density_mode = False
+        if df.empty: return
+        if len(df) > self.density_points.get():
+            self.rebuild_density_view()
+            return
+        if len(df) > PLOT_SAMPLE_LIMIT:
+            # 超大数据只绘制固定的随机抽样，圈选与分类仍基于全部数据
+            rng = np.random.default_rng(0)
+            self.plot_positions = np.sort(rng.choice(len(df), PLOT_SAMPLE_LIMIT, replace=False))
+        self.ax.set_autoscale_on(True)
+        self.ax.relim()
+        self.scatter = self.ax.scatter(df['X'].to_numpy()[self.plot_positions], df['Y'].to_numpy()[self.plot_positions],
+                                       c='#3498DB', s=80, zorder=5, edgecolors='white', linewidth=1.5)
+        self.ax.autoscale_view()
+        self.toolbar.update()
+
+    # --- 聚合密度图 ---
+    # 视野内点数较多时画二维直方图图像 (按视野重新分格，圈选分类着色叠加在对应格子上)，
+    # 放大到点数足够少时改为逐点绘制；标记点始终在动态图元层逐点显示。
+    def rebuild_density_view(self):
+        df = self.clf.df
+        self.density_mode = True
+        self.ax.relim()
+        self.scatter = self.ax.scatter([], [], c='#3498DB', s=80, zorder=5, edgecolors='white', linewidth=1.5)
+        self.density_image = self.ax.imshow(np.zeros((1, 1, 4)), origin='lower', aspect='auto', zorder=4,
+                                            interpolation='nearest')
+        x, y = df['X'].to_numpy(dtype=float), df['Y'].to_numpy(dtype=float)
+        for (lo, hi), set_lim in (((np.nanmin(x), np.nanmax(x)), self.ax.set_xlim),
+                                  ((np.nanmin(y), np.nanmax(y)), self.ax.set_ylim)):
+            pad = (hi - lo) * 0.05 or 0.5
+            set_lim(lo - pad, hi + pad)
+        self.toolbar.update()
+        self.select_density_points()
+
+    def select_density_points(self):
+        """按当前视野决定逐点绘制还是聚合显示"""
+        df = self.clf.df
+        x, y = df['X'].to_numpy(), df['Y'].to_numpy()
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        pos = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        detailed = len(pos) <= DENSITY_DETAIL_POINTS
+        self.density_positions = pos
+        self.plot_positions = pos if detailed else np.empty(0, dtype=np.int64)
+        self.scatter.set_offsets(np.column_stack([x[self.plot_positions], y[self.plot_positions]]))
+        self.density_image.set_visible(not detailed)
+
+    def render_density_image(self):
+        """视野内的点按屏幕格子计数，颜色取格内占多数的圈选分类，透明度随点数对数增长"""
+        if not self.density_image.get_visible(): return
+        df, pos = self.clf.df, self.density_positions
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        bbox = self.ax.get_window_extent()
+        nx, ny = max(1, int(bbox.width // DENSITY_CELL_PX)), max(1, int(bbox.height // DENSITY_CELL_PX))
+        ix = np.clip(((df['X'].to_numpy()[pos] - x0) / (x1 - x0) * nx).astype(np.int64), 0, nx - 1)
+        iy = np.clip(((df['Y'].to_numpy()[pos] - y0) / (y1 - y0) * ny).astype(np.int64), 0, ny - 1)
+        cell = iy * nx + ix
+        counts = np.bincount(cell, minlength=nx * ny)
+        cats = self.clf.category_list
+        style = np.zeros(nx * ny, dtype=np.int64)
+        cat = self.clf.point_category[pos]
+        hit = cat >= 0
+        if cats and hit.any():
+            per_cat = np.bincount(cat[hit] * (nx * ny) + cell[hit], minlength=len(cats) * nx * ny)
+            per_cat = per_cat.reshape(len(cats), nx * ny)
+            style = np.where(per_cat.any(axis=0), per_cat.argmax(axis=0) + 1, 0)
+        palette = to_rgba_array(['#3498DB'] + [c['color'] for c in cats])
+        rgba = palette[style]
+        rgba[:, 3] = np.where(counts > 0, 0.25 + 0.7 * np.log1p(counts) / np.log1p(max(counts.max(), 1)), 0)
+        self.density_image.set_data(rgba.reshape(ny, nx, 4))
+        self.density_image.set_extent((x0, x1, y0, y1))
+
+    def label_style(self, is_marked):
+        return dict(xytext=(0, 8),
+                    textcoords="offset points",
+                    ha='center',
+                    fontsize=9,
+                    color='#E74C3C' if is_marked else '#2C3E50',
+                    weight='bold' if is_marked else 'normal',
+                    bbox=dict(boxstyle="round,pad=0.3",
+                              facecolor='white' if not is_marked else '#E74C3C',
+                              edgecolor='none',
+                              alpha=0.8))
+
+    def update_point_styles(self):
+        """按圈选分类更新散点颜色与大小 (不重建图元)"""
+        if self.scatter is None: return
+        # 调色板第 0 项为未分类样式，第 c+1 项为第 c 个圈选分类
+        cats = self.clf.category_list
+        palette = to_rgba_array(['#3498DB'] + [cat['color'] for cat in cats], alpha=[0.7] + [0.8] * len(cats))
+        sizes = np.array([80] + [120] * len(cats))
+        style = self.clf.point_category[self.plot_positions] + 1
+        self.scatter.set_facecolors(palette[style])
+        self.scatter.set_sizes(sizes[style])
+        if self.density_mode: self.render_density_image()
+
+    def sync_threshold_lines(self):
+        """增删分类线图元 (键为 (轴, 值))，返回 (新增图元, 是否有删除)"""
+        added, removed = [], False
+        wanted = [('y', v) for v in self.clf.thresholds] + [('x', v) for v in self.clf.x_thresholds]
+        for key in list(self.threshold_artists):
+            if key not in wanted:
+                for artist in self.threshold_artists.pop(key): artist.remove()
+                removed = True
+        label_box = dict(boxstyle="round,pad=0.2", facecolor=THEME_COLORS['primary'], alpha=0.8)
+        for key in wanted:
+            if key in self.threshold_artists: continue
+            axis, v = key
+            if axis == 'y':
+                line = self.ax.axhline(y=v, color=THEME_COLORS['primary'],
+                                       linestyle='--', alpha=0.8, linewidth=2)
+                text = self.ax.text(1.0, v, f' {v}', transform=self.ax.get_yaxis_transform(),
+                                    verticalalignment='center', bbox=label_box,
+                                    color='white', fontweight='bold')
             else:
-                line_cats.append((f"低于 {t_sorted[0]}", rem_df[rem_df['Y'] < t_sorted[0]]))
-                for i in range(len(t_sorted) - 1):
-                    line_cats.append((f"{t_sorted[i]} ~ {t_sorted[i + 1]}",
-                                      rem_df[(rem_df['Y'] >= t_sorted[i]) & (rem_df['Y'] < t_sorted[i + 1])]))
-                line_cats.append((f"高于 {t_sorted[-1]}", rem_df[rem_df['Y'] >= t_sorted[-1]]))
-            for name, sub in line_cats:
-                if sub.empty: continue
-                pid = self.tree.insert("", "end", text=f"📂 {self.custom_cat_names.get(name, name)}", open=True)
-                for r_idx, r in sub.iterrows():
-                    m = r_idx in self.marked_indices
-                    self.tree.insert(pid, "end", values=(r['Label'], "✅ 标记" if m else "", r_idx),
-                                     tags=('marked' if m else ''))
+                line = self.ax.axvline(x=v, color=THEME_COLORS['primary'],
+                                       linestyle='--', alpha=0.8, linewidth=2)
+                text = self.ax.text(v, 1.0, f'{v}', transform=self.ax.get_xaxis_transform(),
+                                    horizontalalignment='center', verticalalignment='bottom', bbox=label_box,
+                                    color='white', fontweight='bold')
+            self.threshold_artists[key] = (line, text)
+            TRACER.count("plot.artists_created", 2)
+            added += [line, text]
+        return added, removed
+
+    def sync_marks(self):
+        """同步标记点与标记标签 (动态图元层)"""
+        df, marked = self.clf.df, self.clf.marked_indices
+        for idx in list(self.mark_labels):
+            if idx not in marked: self.mark_labels.pop(idx).remove()
+        pos = np.flatnonzero(self.clf.point_marked)
+        x, y = df['X'].to_numpy(dtype=float)[pos], df['Y'].to_numpy(dtype=float)[pos]
+        self.mark_scatter.set_offsets(np.column_stack([x, y]))
+        for idx, label, xi, yi in zip(df.index[pos].tolist(), df['Label'].take(pos).tolist(), x, y):
+            if idx in self.mark_labels: continue
+            self.mark_labels[idx] = self.ax.annotate(label, (xi, yi), animated=True, **self.label_style(True))
+            TRACER.count("plot.artists_created")
+
+    # --- 标签分层显示 (LOD) ---
+    @traced("recull_labels")
+    def recull_labels(self):
+        """在当前视野内挑选要显示的标签：开启分层时按屏幕网格每格只保留一个，避免重叠"""
+        self.label_recull_pending = False
+        df = self.clf.df
+        if self.scatter is None or df.empty:
+            self.set_point_labels(np.empty(0, dtype=np.int64))
+            return
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+
+        def in_view(pos):
+            x, y = df['X'].to_numpy()[pos], df['Y'].to_numpy()[pos]
+            return pos[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+
+        # 候选为已绘制的点；标记点的标签已在动态图元层显示
+        candidates = in_view(self.plot_positions)
+        candidates = candidates[~self.clf.point_marked[candidates]]
+        if not self.label_lod.get():
+            self.set_point_labels(candidates)
+            return
+        cw, ch = LABEL_CELL_SIZE
+
+        def cells_of(pos):
+            px = self.ax.transData.transform(np.column_stack([df['X'].to_numpy()[pos], df['Y'].to_numpy()[pos]]))
+            return np.floor(px[:, 0] / cw).astype(np.int64) * 100000 + np.floor(px[:, 1] / ch).astype(np.int64)
+
+        cells = cells_of(candidates)
+        free = np.flatnonzero(~np.isin(cells, cells_of(in_view(np.flatnonzero(self.clf.point_marked)))))
+        _, first = np.unique(cells[free], return_index=True)
+        self.set_point_labels(candidates[np.sort(free[first])])
+
+    def set_point_labels(self, positions):
+        """复用标签图元池显示给定行位置的标签"""
+        df = self.clf.df
+        labels = df['Label'].take(positions).tolist()
+        xs, ys = df['X'].to_numpy()[positions].tolist(), df['Y'].to_numpy()[positions].tolist()
+        TRACER.count("plot.artists_created", max(0, len(labels) - len(self.point_labels)))
+        while len(self.point_labels) < len(labels):
+            self.point_labels.append(self.ax.annotate("", (0, 0), **self.label_style(False)))
+        for ann in self.point_labels[len(labels):]: ann.remove()
+        del self.point_labels[len(labels):]
+        for ann, label, x, y in zip(self.point_labels, labels, xs, ys):
+            ann.set_text(label)
+            ann.xy = (x, y)
+
+    def schedule_view_update(self, *args):
+        """缩放/平移/改变窗口大小后合并为一次更新 (聚合图重新分格、标签重新挑选)"""
+        if self.label_recull_pending: return
+        self.label_recull_pending = True
+        self.root.after_idle(self.on_view_change)
+
+    def on_view_change(self):
+        if self.density_mode:
+            self.select_density_points()
+            self.update_point_styles()
+        self.on_label_lod_change()
+
+    def on_label_lod_change(self):
+        self.recull_labels()
+        self.request_plot_redraw()
+
+    def on_density_points_change(self, *args):
+        try:
+            self.density_points.get()
+        except tk.TclError:
+            self.density_points.set(DENSITY_MODE_POINTS)
+        if self.clf.df.empty or (len(self.clf.df) > self.density_points.get()) == self.density_mode: return
+        self.plot_df = None
+        self.schedule_refresh('plot')
+
+    def sync_lasso(self):
+        if self.enable_lasso_mode.get():
+            if self.lasso is None:
+                self.lasso = LassoSelector(self.ax, onselect=self.on_lasso_select,
+                                           props={'color': THEME_COLORS['accent'], 'linewidth': 2})
+        elif self.lasso:
+            self.lasso.set_active(False)
+            self.lasso = None
+
+    # --- 局部刷新 (blit) ---
+    def request_plot_redraw(self):
+        self.plot_background = None
+        self.canvas.draw_idle()
+
+    def on_canvas_draw(self, event):
+        """完整重绘后缓存背景，并补画动态图元"""
+        self.plot_background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated_artists()
+
+    def draw_animated_artists(self):
+        self.ax.draw_artist(self.mark_scatter)
+        for ann in self.mark_labels.values(): self.ax.draw_artist(ann)
+        for line in self.split_artists: self.ax.draw_artist(line)
+
+    def blit_plot(self, *new_artists):
+        """把新增的静态图元画进缓存背景，再叠加动态图元，只刷新变化部分"""
+        if self.plot_background is None:
+            self.request_plot_redraw()
+            return
+        self.canvas.restore_region(self.plot_background)
+        for artist in new_artists: self.ax.draw_artist(artist)
+        if new_artists: self.plot_background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated_artists()
+        self.canvas.blit(self.fig.bbox)
+
+    def refresh_threshold_lines(self):
+        added, removed = self.sync_threshold_lines()
+        self.update_stats_display()
+        if removed:
+            self.request_plot_redraw()
+        else:
+            self.blit_plot(*added)
+
+    def refresh_marks(self):
+        self.sync_marks()
+        self.update_stats_display()
+        self.blit_plot()
+
+    @traced("classify_and_display")
+    def classify_and_display(self):
+        if len(self.clf.df) < BACKGROUND_CLASSIFY_ROWS:
+            self.clf.classify()
+            self.display_groups()
+            return
+        snap = self.clf.snapshot()
+        self.run_in_background('classify', snap.classify, lambda groups: self.on_classified(snap))
+
+    def on_classified(self, snap):
+        # 计算期间分类状态又被修改过：按最新状态重新计算
+        if not self.clf.adopt_groups(snap):
+            self.classify_and_display()
+            return
+        self.display_groups()
+
+    @traced("display_groups")
+    def display_groups(self):
+        """按引擎中现有的分类结果重建分类树与报告"""
+        self.display_tree()
         self.generate_report_from_tree()
 
+    def display_tree(self):
+        self.configure_tree_mode()
+        if self.virtual_tree:
+            self.render_virtual_tree()
+        else:
+            for i in self.tree.get_children(): self.tree.delete(i)
+            self.tree_groups = {}
+            for grp in self.clf.groups:
+                self.insert_tree_group(grp, "end")
+
+    def insert_tree_group(self, grp, position):
+        """插入一个分类文件夹及其条目，空分类不显示"""
+        if not len(grp['indices']): return
+        pid = self.tree.insert("", position, iid=f"grp{grp['gid']}", text=f"📂 {grp['name']}", open=True,
+                               tags=self.color_tag(grp['color']))
+        self.tree_groups[pid] = grp
+        marked = self.clf.marked_indices
+        TRACER.count("tree.rows_inserted", len(grp['indices']))
+        for idx, label in zip(grp['indices'].tolist(), self.clf.labels_of(grp['indices'])):
+            m = idx in marked
+            self.tree.insert(pid, "end", iid=f"row{idx}", values=(label, "✅ 标记" if m else "", idx),
+                             tags=('marked' if m else ''))
+
+    def color_tag(self, color):
+        """圈选分类文件夹的颜色标签，每种颜色只配置一次 (字体为共用的命名字体)"""
+        if not color: return ()
+        tag = f"tag_{color}"
+        if tag not in self.color_tags:
+            self.tree.tag_configure(tag, foreground=color, font=self.bold_font)
+            self.color_tags.add(tag)
+        return (tag,)
+
+    def tree_rebuild_pending(self):
+        """树已排队等待整体重建 (此时树节点与引擎分组可能不一致)"""
+        return bool(self.dirty_layers & {'tree', 'classify'})
+
+    def apply_group_change(self, change):
+        """增量更新：只替换受影响的分类文件夹"""
+        if change is not None and not change[1] and not change[2]: return
+        if change is None or self.virtual_tree or self.tree_rebuild_pending():
+            # 引擎已整体重新分类 / 虚拟树只需重画可见窗口 / 树已待整体重建，增量修补会与其冲突
+            self.schedule_refresh('lines', 'tree')
+            return
+        start, removed, added = change
+        for grp in removed:
+            pid = f"grp{grp['gid']}"
+            if self.tree.exists(pid):
+                self.tree.delete(pid)
+                del self.tree_groups[pid]
+        position = sum(1 for g in self.clf.groups[:start] if len(g['indices']))
+        for grp in added:
+            self.insert_tree_group(grp, position)
+            if len(grp['indices']): position += 1
+        self.schedule_refresh('lines', 'report')
+
+    @traced("generate_report_from_tree")
     def generate_report_from_tree(self):
-        self.report_text.delete("1.0", tk.END);
-        content = ""
-        for pid in self.tree.get_children(""):
-            title = self.tree.item(pid, "text").replace("📂 ", "");
-            children = self.tree.get_children(pid)
-            if not children: continue
-            content += f"【{title}】:\n"
-            prev_m = None
-            for i, cid in enumerate(children):
-                vals = self.tree.item(cid, "values");
-                name, idx = vals[0], int(vals[2]);
-                curr_m = idx in self.marked_indices
-                if curr_m:
-                    if prev_m is False or prev_m is None: content += "\n"
-                    content += f"{name}\n"
-                else:
-                    content += f"\n{name}\n\n"
-                if curr_m:
-                    next_m = False
-                    if i < len(children) - 1: next_m = int(
-                        self.tree.item(children[i + 1], "values")[2]) in self.marked_indices
-                    if not next_m: content += "\n"
-                prev_m = curr_m
-            content += "\n"
-        self.report_text.insert(tk.END, re.sub(r'\n{3,}', '\n\n', content).strip() + "\n")
+        """重建整份报告；每个分类的片段打上 sec{gid} 标签，供局部更新定位"""
+        self.report_text.delete("1.0", tk.END)
+        self.report_convert_mode = None
+        stale = [t for t in self.report_text.tag_names() if t.startswith("sec")]
+        if stale: self.report_text.tag_delete(*stale)
+        chunks = self.clf.report_chunks()
+        self.report_gids = [grp['gid'] for grp, _ in chunks]
+        if not chunks:
+            self.report_text.insert(tk.END, "\n")
+            return
+        args = []
+        for grp, text in chunks: args += [text, f"sec{grp['gid']}"]
+        self.report_text.insert(tk.END, *args)
+        self.report_text.edit_modified(False)
+
+    @traced("update_report_sections")
+    def update_report_sections(self, groups):
+        """只重写给定分类的报告片段；分类集合变化或片段已被手动编辑掉时整份重建"""
+        gids = [g['gid'] for g in self.clf.groups if len(g['indices'])]
+        if gids != self.report_gids:
+            self.generate_report_from_tree()
+            return
+        for grp in groups:
+            tag = f"sec{grp['gid']}"
+            ranges = self.report_text.tag_ranges(tag)
+            if not ranges:
+                self.generate_report_from_tree()
+                return
+            text = self.clf.report_section(grp) + ("\n" if grp['gid'] == gids[-1] else "\n\n")
+            start = str(ranges[0])
+            self.report_text.delete(start, ranges[-1])
+            self.report_text.insert(start, text, tag)
+        self.report_text.edit_modified(False)
 
     def on_font_combo_change(self, event):
         self.current_font_size = int(self.combo_font.get());
         self.apply_font_style();
-        self.refresh_all()
+        # 虚拟树可见行数随行高变化，只需重画可见窗口
+        if self.virtual_tree: self.render_virtual_tree()
 
     def apply_font_style(self):
+        """调整命名字体与行高：树条目、颜色标签和报告随之更新，不重建数据"""
         s = self.current_font_size
-        ttk.Style().configure("Treeview", font=("Microsoft YaHei", s), rowheight=int(s * 2.5))
-        self.tree.tag_configure('marked', foreground='red', font=("", s, "bold"))
-        self.report_text.configure(font=("Microsoft YaHei", s))
+        self.content_font.configure(size=s)
+        self.bold_font.configure(size=s)
+        self.tree_row_height = int(s * 2.5)
+        ttk.Style().configure("Treeview", font=self.content_font, rowheight=self.tree_row_height)
+        self.tree.tag_configure('marked', foreground='red', font=self.bold_font)
 
     def on_right_click(self, event):
         iid = self.tree.identify_row(event.y)
         if iid:
             self.tree.selection_set(iid)
             if self.tree.parent(iid):
-                idx = int(self.tree.item(iid, 'values')[2])
-                if idx in self.marked_indices:
-                    self.marked_indices.remove(idx)
-                else:
-                    self.marked_indices.add(idx)
-                self.refresh_all()
+                idx = self.row_index_of(iid)
+                m = self.clf.toggle_mark(idx)
+                if m is not None: self.show_mark(idx, m)
             else:
                 old = self.tree.item(iid, "text").replace("📂 ", "")
                 new = simpledialog.askstring("重命名", "分类名称:", initialvalue=old)
-                if new:
-                    idx = self.tree.get_children("").index(iid);
-                    if idx < len(self.category_list):
-                        self.category_list[idx]['name'] = new
-                    else:
-                        self.custom_cat_names[old] = new
-                    self.refresh_all()
+                if new and iid in self.tree_groups:
+                    grp = self.tree_groups[iid]
+                    self.clf.rename_group(grp, new)
+                    self.tree.item(iid, text=f"📂 {grp['name']}")
+                    self.schedule_refresh(sections=[grp])
+
+    def show_mark(self, idx, m):
+        """标记切换后同步树条目、绘图与对应的报告片段"""
+        iid = f"row{idx}"
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=(self.tree.item(iid, 'values')[0], "✅ 标记" if m else "", idx),
+                           tags=('marked' if m else ''))
+        grp, _ = self.clf.locate(idx)
+        if grp is not None:
+            self.schedule_refresh('marks', sections=[grp])
+        else:
+            self.schedule_refresh('marks', 'report')
 
     def refresh_all(self):
-        self.update_plot_view(); self.classify_and_display()
+        self.schedule_refresh('plot', 'classify')
+
+    # --- 刷新调度 ---
+    # 各处只登记需要刷新的层，空闲时一次性处理：plot 同步整个绘图 (含 lines/marks)，
+    # lines 只同步分类线，marks 只同步标记层；classify 重新分类并重建树与报告，
+    # tree 按现有分类重建树 (连同报告)，report 重建整份报告，否则只重写登记过的报告片段
+    def schedule_refresh(self, *layers, sections=()):
+        self.dirty_layers.update(layers)
+        for grp in sections: self.dirty_sections[grp['gid']] = grp
+        if self.refresh_pending: return
+        self.refresh_pending = True
+        self.root.after_idle(self.flush_refresh)
+
+    @traced("flush_refresh")
+    def flush_refresh(self):
+        dirty, sections = self.dirty_layers, list(self.dirty_sections.values())
+        self.dirty_layers, self.dirty_sections, self.refresh_pending = set(), {}, False
+        if 'plot' in dirty:
+            self.update_plot_view()
+        else:
+            if 'lines' in dirty: self.refresh_threshold_lines()
+            if 'marks' in dirty: self.refresh_marks()
+        if 'classify' in dirty:
+            self.classify_and_display()
+        elif 'tree' in dirty:
+            self.display_groups()
+        elif 'report' in dirty:
+            self.generate_report_from_tree()
+        elif sections:
+            self.update_report_sections(sections)
+
+    # ===============================================
+    # ↶ ↷ 撤销/重做
+    # ===============================================
+    def on_undo_key(self, event):
+        # 文本框内的 Ctrl+Z 留给文本框自身
+        if not isinstance(event.widget, (tk.Text, tk.Entry)): self.undo()
+
+    def on_redo_key(self, event):
+        if not isinstance(event.widget, (tk.Text, tk.Entry)): self.redo()
+
+    def undo(self):
+        self.apply_history_step(self.clf.undo())
+
+    def redo(self):
+        self.apply_history_step(self.clf.redo())
+
+    def apply_history_step(self, result):
+        if result is None: return
+        kind, change = result
+        if kind in ('threshold', 'thresholds'):
+            self.apply_group_change(change)
+        elif kind == 'mark':
+            self.show_mark(*change)
+        else:
+            self.refresh_all()
 
     def delete_selected_data(self):
-        items = self.tree.selection()
-        indices = [int(self.tree.item(i, 'values')[2]) for i in items if self.tree.parent(i)]
+        indices = self.selected_row_indices()
         if indices and messagebox.askyesno("确认", "删除数据？"):
-            self.df = self.df.drop(indices).reset_index(drop=True)
-            self.category_list, self.marked_indices = [], set();
+            self.clf.delete_rows(indices)
+            # 大数据量时重新分类在后台进行，先按已剔除被删行的分组重绘树
+            if len(self.clf.df) >= BACKGROUND_CLASSIFY_ROWS: self.display_tree()
             self.refresh_all()
 
     def reset_all(self):
-        self.thresholds, self.category_list, self.marked_indices, self.custom_cat_names = [], [], set(), {};
+        self.clf.reset()
         self.refresh_all()
 
+    @traced("load_from_text")
     def load_from_text(self):
+        raw = ""
         try:
-            txt = self.root.clipboard_get()
-            if txt: self.text_input.delete("1.0", tk.END); self.text_input.insert(tk.END, txt)
-        except:
+            raw = self.root.clipboard_get()
+        except tk.TclError:
             pass
-        raw = self.text_input.get("1.0", tk.END).strip();
-        data = []
-        for line in raw.split('\n'):
-            parts = re.split(r'[|\t,，]+', line.strip())
-            if len(parts) >= 3:
-                try:
-                    data.append([parts[0].strip(), float(parts[1]), float(parts[2])])
-                except:
-                    continue
-        if data:
-            self.df = pd.DataFrame(data, columns=['Label', 'Y', 'X']);
-            self.reset_all();
+        if raw:
+            # 大段文本只在输入框中预览，解析直接基于剪贴板内容
+            self.text_input.delete("1.0", tk.END)
+            self.text_input.insert(tk.END, "\n".join(raw.split("\n", TEXT_PREVIEW_LINES)[:TEXT_PREVIEW_LINES]))
+        else:
+            raw = self.text_input.get("1.0", tk.END)
+        self.run_in_background('load', lambda: parse_table_text(raw), lambda r: self.load_dataframe(*r))
+
+    def load_from_file(self):
+        path = filedialog.askopenfilename(filetypes=[("表格数据", "*.csv *.tsv *.txt"), ("所有文件", "*.*")])
+        if not path: return
+        if os.path.getsize(path) <= CHUNKED_IMPORT_BYTES:
+            self.run_in_background('load', lambda: read_table_file(path), lambda r: self.load_dataframe(*r))
+            return
+        # 大文件分块流式导入到新的引擎，沿用当前分类线；完成后替换当前引擎
+        clf = Classifier()
+        clf.thresholds, clf.custom_cat_names = list(self.clf.thresholds), dict(self.clf.custom_cat_names)
+        clf.x_thresholds = list(self.clf.x_thresholds)
+        chunks = self.cancellable('load', iter_table_chunks(path))
+        self.run_in_background('load', lambda: clf.ingest_chunks(chunks), lambda r: self.on_chunks_loaded(clf, r))
+
+    def on_chunks_loaded(self, clf, rejected):
+        self.show_rejected_lines(rejected)
+        self.clf = clf
+        self.schedule_refresh('plot', 'tree')
+        self.main_notebook.select(self.tab_plt)
+
+    def save_session(self):
+        path = filedialog.asksaveasfilename(defaultextension=".fls", filetypes=[("分类项目", "*.fls")])
+        if path: self.clf.save_session(path)
+
+    def open_session(self):
+        path = filedialog.askopenfilename(filetypes=[("分类项目", "*.fls"), ("所有文件", "*.*")])
+        if not path: return
+        try:
+            self.clf.load_session(path)
+        except (ValueError, KeyError, OSError) as e:
+            messagebox.showerror("打开失败", f"无法读取项目文件：{e}")
+            return
+        self.schedule_refresh('plot', 'tree')
+        self.main_notebook.select(self.tab_plt)
+
+    def show_rejected_lines(self, rejected):
+        if rejected:
+            shown = ", ".join(map(str, rejected[:20])) + (" …" if len(rejected) > 20 else "")
+            messagebox.showwarning("部分数据未导入", f"{len(rejected)} 行无法解析，已跳过：第 {shown} 行")
+
+    @traced("load_dataframe")
+    def load_dataframe(self, df, rejected):
+        self.show_rejected_lines(rejected)
+        if not df.empty:
+            self.clf.set_data(df)
+            self.refresh_all()
             self.main_notebook.select(self.tab_plt)
 
     def convert_text(self, mode):
         if not HAS_OPENCC: return
+        data_converted = self.convert_data_labels.get() and not self.clf.df.empty
+        if data_converted:
+            # 先转换数据本身，报告按新名称重建后再转换分类标题 (名称均已在缓存中)
+            self.clf.convert_labels(mode)
+            self.plot_df = None
+            self.update_plot_view()
+            self.display_groups()
         txt = self.report_text.get("1.0", tk.END).strip()
         if txt:
-            converter = opencc.OpenCC(mode);
             self.report_text.delete("1.0", tk.END);
-            self.report_text.insert(tk.END, converter.convert(txt))
+            self.report_text.insert(tk.END, convert_lines(mode, txt))
+            self.report_text.edit_modified(False)
+        if not data_converted: self.report_convert_mode = mode
 
     def convert_to_simplified(self):
         self.convert_text('t2s')
@@ -963,14 +2831,282 @@ class DataClassifierApp:
         self.convert_text('s2t')
 
     def export_txt_file(self):
-        raw = self.report_text.get("1.0", tk.END);
+        # 导出按分类数据流式生成 (套用报告当前的简繁转换)，报告框中的手动修改不会导出
+        if self.report_text.edit_modified() and not messagebox.askokcancel(
+                "导出 TXT", "报告中手动修改的内容不会导出 (导出按当前分类数据生成)，是否继续？"):
+            return
         path = filedialog.asksaveasfilename(defaultextension=".txt")
-        if path:
-            filtered = [l for l in raw.splitlines() if not (l.strip().startswith("【") and "】" in l)]
-            with open(path, "w", encoding="utf-8") as f: f.write("\n".join(filtered).strip())
+        if path: self.clf.export_txt(path, self.report_convert_mode)
+
+    def export_table_file(self):
+        filetypes = [("CSV 文件", "*.csv")] + ([("Parquet 文件", "*.parquet")] if HAS_PYARROW else [])
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=filetypes)
+        if not path: return
+        if path.lower().endswith(".parquet"):
+            if not HAS_PYARROW:
+                messagebox.showerror("导出失败", "导出 Parquet 需要安装 pyarrow")
+                return
+            self.clf.export_parquet(path)
+        else:
+            self.clf.export_csv(path)
 
 
-if __name__ == "__main__":
+# ==========================================
+# 🖥️ 命令行批处理 (不导入界面模块)
+# ==========================================
+# 用法：python fl.py classify --thresholds 1.5,3,7.2 [--x-thresholds 2,5] a.csv b.csv
+#       python fl.py classify --session 项目.fls -o 输出目录 data/*.csv
+# 输出文件后缀：追加在输入文件名 (去掉扩展名) 之后，写到输入文件所在目录时也不会覆盖输入文件
+CLI_FORMATS = {'report': '.report.txt', 'txt': '.classified.txt', 'csv': '.classified.csv',
+               'parquet': '.classified.parquet'}
+
+
+def classify_file(path, thresholds, x_thresholds, custom_cat_names, out_path, fmt):
+    """在工作进程中处理单个文件，返回 (输入路径, 输出路径, 行数, 无法解析的行数)"""
+    clf = Classifier()
+    if os.path.getsize(path) > CHUNKED_IMPORT_BYTES:
+        clf.thresholds, clf.x_thresholds = sorted(thresholds), sorted(x_thresholds)
+        clf.custom_cat_names = dict(custom_cat_names)
+        rejected = clf.ingest_chunks(iter_table_chunks(path))
+    else:
+        df, rejected = read_table_file(path)
+        clf.set_data(df)
+        clf.thresholds, clf.x_thresholds = sorted(thresholds), sorted(x_thresholds)
+        clf.custom_cat_names = dict(custom_cat_names)
+        clf.classify()
+    if fmt == 'report':
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.writelines([text for _, text in clf.report_chunks()] or ["\n"])
+    else:
+        getattr(clf, f"export_{fmt}")(out_path)
+    return path, out_path, len(clf.df), len(rejected)
+
+
+def run_cli(argv):
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+    parser = argparse.ArgumentParser(prog="fl.py classify", description="按分类线批量生成分类报告")
+    parser.add_argument("inputs", nargs="+", help="CSV/TSV/TXT 数据文件")
+    parser.add_argument("--thresholds", default="", help="逗号分隔的分类线 Y 值，如 1.5,3,7.2")
+    parser.add_argument("--x-thresholds", default="", help="逗号分隔的竖直分类线 X 值，与横线组成网格")
+    parser.add_argument("--session", help="从项目文件 (.fls) 读取分类线与分类名称")
+    parser.add_argument("-o", "--output-dir", help="输出目录 (默认与输入文件相同)")
+    parser.add_argument("-f", "--format", choices=sorted(CLI_FORMATS), default="report",
+                        help="report: 带分类标题的报告 (默认)；txt: 无标题文本；csv/parquet: 表格")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    args = parser.parse_args(argv)
+
+    thresholds, x_thresholds, custom_cat_names = [], [], {}
+    if args.session:
+        header, _ = read_session_header(args.session)
+        thresholds, custom_cat_names = header['thresholds'], header['custom_cat_names']
+        x_thresholds = header.get('x_thresholds', [])
+    try:
+        thresholds += [float(v) for v in args.thresholds.split(",") if v.strip()]
+        x_thresholds += [float(v) for v in args.x_thresholds.split(",") if v.strip()]
+    except ValueError:
+        parser.error("--thresholds / --x-thresholds 必须是逗号分隔的数字")
+    thresholds, x_thresholds = sorted(set(thresholds)), sorted(set(x_thresholds))
+    if args.format == 'parquet' and not HAS_PYARROW: parser.error("导出 Parquet 需要安装 pyarrow")
+
+    def out_path(path):
+        name = os.path.splitext(os.path.basename(path))[0] + CLI_FORMATS[args.format]
+        return os.path.join(args.output_dir or os.path.dirname(path), name)
+
+    # 不同目录下的同名输入写到同一个 -o 目录会互相覆盖，先检查再开始处理
+    outputs = {}
+    for p in args.inputs:
+        outputs.setdefault(os.path.normcase(os.path.abspath(out_path(p))), []).append(p)
+    clashes = [ps for ps in outputs.values() if len(ps) > 1]
+    if clashes:
+        parser.error("以下输入文件的输出路径相同，会互相覆盖：" + "；".join(", ".join(ps) for ps in clashes))
+
+    if args.output_dir: os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(args.inputs)))) as pool:
+        futures = [pool.submit(classify_file, p, thresholds, x_thresholds, custom_cat_names, out_path(p), args.format)
+                   for p in args.inputs]
+        for p, future in zip(args.inputs, futures):
+            try:
+                src, dst, rows, rejected = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"✗ {p}: {e}", file=sys.stderr)
+                continue
+            note = f"，{rejected} 行无法解析" if rejected else ""
+            print(f"✓ {src} → {dst} ({rows} 行{note})")
+    return 1 if failed else 0
+
+
+# ==========================================
+# ⏱️ 性能基准
+# ==========================================
+# 用法：python fl.py bench [--sizes 1000,100000] [--save 基线.json] [--compare 基线.json]
+# 合成数据上分别测量引擎与界面 (隐藏的 Tk 窗口) 的关键路径：耗时取多次运行的最小值，
+# 峰值内存为单次运行期间新增分配的峰值 (tracemalloc，另行运行以免拖慢计时)。
+BENCH_LASSO = [(2, 2), (6, 2), (4, 6)]
+
+
+def synthetic_text(n, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = rng.uniform(0, 10, n).round(2), rng.uniform(0, 10, n).round(2)
+    return "\n".join(f"p{i},{yi},{xi}" for i, yi, xi in zip(range(n), y.tolist(), x.tolist()))
+
+
+def bench_measure(work, repeat, setup=None):
+    """返回 (最短耗时秒数, 峰值新增内存字节)；先预热一次，排除延迟导入等一次性开销"""
+    import tracemalloc
+    if setup: setup()
+    work()
+    best = float("inf")
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        work()
+        best = min(best, time.perf_counter() - start)
+    if setup: setup()
+    tracemalloc.start()
+    try:
+        work()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def bench_setup_engine(clf, thresholds, categories, seed=0):
+    """设置分类线并圈选若干矩形区域作为圈选分类"""
+    rng = np.random.default_rng(seed)
+    clf.reset()
+    for t in np.linspace(0, 10, thresholds + 2)[1:-1].round(2).tolist(): clf.add_threshold(t)
+    for k in range(categories):
+        x0, y0 = rng.uniform(0, 8, 2).tolist()
+        rect = [(x0, y0), (x0 + 2, y0), (x0 + 2, y0 + 2), (x0, y0 + 2)]
+        clf.add_lasso_category(clf.lasso_select(rect), '#E74C3C')
+    clf.classify()
+
+
+def bench_engine(n, text, thresholds, categories, repeat, first):
+    results = {}
+    if first: results['parse'] = bench_measure(lambda: parse_table_text(text), repeat)
+    clf = Classifier()
+    clf.set_data(parse_table_text(text)[0])
+    bench_setup_engine(clf, thresholds, categories)
+    results['classify'] = bench_measure(clf.classify, repeat)
+    results['report'] = bench_measure(clf.report, repeat)
+
+    def fresh_grid(): clf.grid = None
+    results['lasso'] = bench_measure(lambda: clf.lasso_select(BENCH_LASSO), repeat, setup=fresh_grid)
+
+    def fresh_split(): clf._split_cache = None
+    results['auto_split'] = bench_measure(lambda: clf.suggest_thresholds(5), repeat, setup=fresh_split)
+    return results
+
+
+def bench_gui(app, root, n, text, thresholds, categories, repeat, first):
+    def settle():
+        # 处理完后台任务与挂起的界面事件
+        root.update()
+        while app.jobs: root.update()
+
+    def load():
+        root.clipboard_clear()
+        root.clipboard_append(text)
+        app.load_from_text()
+        settle()
+
+    def plot():
+        app.plot_df = None
+        app.update_plot_view()
+        app.canvas.draw()
+
+    def lasso():
+        app.on_lasso_select(BENCH_LASSO)
+        settle()
+
+    def undo_lasso():
+        if app.clf.undo_stack and app.clf.undo_stack[-1]['kind'] == 'lasso': app.undo()
+        settle()
+
+    results = {}
+    if first:
+        results['gui.load_from_text'] = bench_measure(load, repeat)
+    else:
+        load()
+    bench_setup_engine(app.clf, thresholds, categories)
+    app.clf.clear_history()
+    app.refresh_all()
+    settle()
+    results['gui.classify_and_display'] = bench_measure(lambda: (app.classify_and_display(), settle()), repeat)
+    results['gui.generate_report_from_tree'] = bench_measure(app.generate_report_from_tree, repeat)
+    results['gui.update_plot_view'] = bench_measure(plot, repeat)
+    results['gui.on_lasso_select'] = bench_measure(lasso, repeat, setup=undo_lasso)
+    undo_lasso()
+    return results
+
+
+def run_bench(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fl.py bench", description="在合成数据上测量关键路径的耗时与峰值内存")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="数据点数，逗号分隔")
+    parser.add_argument("--thresholds", default="1,10", help="分类线条数，逗号分隔")
+    parser.add_argument("--categories", default="0,5", help="圈选分类个数，逗号分隔")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="计时重复次数 (取最小值)")
+    parser.add_argument("--engine-only", action="store_true", help="只测引擎，不启动界面")
+    parser.add_argument("--save", help="把结果保存为基线 JSON")
+    parser.add_argument("--compare", help="与基线 JSON 比较")
+    args = parser.parse_args(argv)
+
+    def ints(s): return [int(v) for v in s.split(",") if v.strip()]
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+    app = root = None
+    if not args.engine_only:
+        try:
+            load_gui()
+            root = tk.Tk()
+            root.withdraw()
+            app = DataClassifierApp(root)
+            root.update()
+        except Exception as e:
+            print(f"无法启动界面，只测引擎：{e}", file=sys.stderr)
+            app = root = None
+
+    results, slower = {}, 0
+    print(f"{'阶段':<32}{'点数':>9}{'线':>4}{'圈':>4}{'耗时 ms':>12}{'峰值 MB':>10}  基线")
+    for n in ints(args.sizes):
+        text = synthetic_text(n)
+        for i, (t, c) in enumerate(itertools.product(ints(args.thresholds), ints(args.categories))):
+            stages = bench_engine(n, text, t, c, args.repeat, i == 0)
+            if app is not None: stages.update(bench_gui(app, root, n, text, t, c, args.repeat, i == 0))
+            for stage, (seconds, peak) in stages.items():
+                key = f"{stage}/n={n}/t={t}/c={c}"
+                results[key] = {'time': seconds, 'peak': peak}
+                note = ""
+                if key in baseline:
+                    ratio = seconds / max(baseline[key]['time'], 1e-9)
+                    note = f"{ratio:.2f}×" + (" ⚠ 变慢" if ratio > 1.2 else "")
+                    slower += ratio > 1.2
+                print(f"{stage:<32}{n:>9}{t:>4}{c:>4}{seconds * 1000:>12.1f}{peak / 2 ** 20:>10.1f}  {note}")
+    if root is not None: root.destroy()
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f: json.dump(results, f, indent=1)
+    return 1 if slower else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "classify":
+        return run_cli(argv[1:])
+    if argv and argv[0] == "bench":
+        return run_bench(argv[1:])
+    load_gui()
     root = tk.Tk();
     app = DataClassifierApp(root);
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,151 @@
+import random
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fl import Classifier
+
+
+def make_classifier(n, seed, dtype=float, nan=0.0):
+    rng = np.random.default_rng(seed)
+    y, x = rng.uniform(0, 10, n).round(1), rng.uniform(0, 10, n).round(1)
+    y[rng.random(n) < nan] = np.nan
+    x[rng.random(n) < nan] = np.nan
+    c = Classifier()
+    c.set_data(pd.DataFrame({'Label': [f"p{i}" for i in range(n)], 'Y': y.astype(dtype), 'X': x.astype(dtype)}))
+    c.classify()
+    return c
+
+
+def group_state(c):
+    return [(g['name'], sorted(g['indices'].tolist())) for g in c.groups]
+
+
+def engine_state(c):
+    return (c.df.to_csv(), list(c.thresholds), list(c.x_thresholds),
+            [(cat['name'], sorted(cat['indices'])) for cat in c.category_list],
+            sorted(c.marked_indices), c.point_category.tolist(), c.point_marked.tolist())
+
+
+def reference_report(c):
+    """改版前按树逐条拼接、再压缩空行的报告算法"""
+    content = ""
+    for g in c.groups:
+        children = g['indices'].tolist()
+        if not children: continue
+        content += f"【{g['name']}】:\n"
+        prev_m = None
+        for i, idx in enumerate(children):
+            name, curr_m = c.df.at[idx, 'Label'], idx in c.marked_indices
+            if curr_m:
+                if not prev_m: content += "\n"
+                content += f"{name}\n"
+                if i == len(children) - 1 or children[i + 1] not in c.marked_indices: content += "\n"
+            else:
+                content += f"\n{name}\n\n"
+            prev_m = curr_m
+        content += "\n"
+    return re.sub(r'\n{3,}', '\n\n', content).strip() + "\n"
+
+
+# --- 增量分类 ---
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_threshold_matches_full_classify(seed):
+    random.seed(seed)
+    c = make_classifier(80, seed, np.float32 if seed % 2 else float, nan=0.05)
+    if seed % 3 == 0:
+        c.add_lasso_category(set(random.sample(range(80), 10)), '#E74C3C')
+        c.classify()
+    for _ in range(12):
+        axis = random.choice('xyy')
+        lines = c.thresholds if axis == 'y' else c.x_thresholds
+        if lines and random.random() < .35:
+            c.remove_threshold(random.choice(lines), axis)
+        else:
+            c.add_threshold(round(random.uniform(0, 10), 1), axis)
+        full = Classifier()
+        full.df, full.category_list = c.df, c.category_list
+        full.thresholds, full.x_thresholds = list(c.thresholds), list(c.x_thresholds)
+        full.rebuild_point_styles()
+        full.classify()
+        assert group_state(c) == group_state(full)
+
+
+# --- 报告 ---
+@pytest.mark.parametrize("seed", range(30))
+def test_report_matches_reference(seed):
+    random.seed(seed)
+    c = make_classifier(random.randint(0, 40), seed)
+    for v in random.sample([2, 4, 6, 8], random.randint(0, 4)): c.add_threshold(v)
+    for i in random.sample(list(c.df.index), len(c.df) // 2): c.toggle_mark(i)
+    if len(c.df) > 5: c.add_lasso_category(set(random.sample(list(c.df.index), 5)), '#E74C3C')
+    c.classify()
+    assert c.report() == reference_report(c)
+
+
+# --- 项目文件 ---
+def test_session_round_trip(tmp_path):
+    c = make_classifier(50, 0, np.float32)
+    c.add_threshold(5)
+    c.add_threshold(3, 'x')
+    c.add_lasso_category({1, 2, 3, 4}, '#E74C3C')
+    c.toggle_mark(7)
+    c.toggle_mark(2)
+    c.delete_rows([0, 10])
+    c.custom_cat_names['低于 5'] = '下'
+    c.classify()
+    path = tmp_path / "s.fls"
+    c.save_session(str(path))
+    d = Classifier()
+    d.load_session(str(path))
+    # 标签以分类编码保存，比较取值即可
+    pd.testing.assert_frame_equal(d.df.astype({'Label': str}), c.df.astype({'Label': str}), check_index_type=False)
+    assert engine_state(d)[1:] == engine_state(c)[1:]
+    assert group_state(d) == group_state(c)
+    assert d.report() == c.report()
+
+
+# --- 撤销 / 重做 ---
+@pytest.mark.parametrize("seed", range(10))
+def test_undo_redo_restores_every_state(seed):
+    random.seed(seed)
+    c = make_classifier(60, seed)
+    states = [engine_state(c)]
+    for _ in range(40):
+        r, n, before = random.random(), len(c.df), len(c.undo_stack)
+        if r < .25:
+            c.add_threshold(round(random.random() * 10, 1))
+        elif r < .35 and c.thresholds:
+            c.remove_threshold(random.choice(c.thresholds))
+        elif r < .55 and n:
+            c.toggle_mark(int(random.choice(c.df.index)))
+        elif r < .7 and n:
+            c.add_lasso_category(set(random.sample(list(c.df.index), min(n, 8))), '#E74C3C')
+        elif r < .8:
+            c.insert_rows(random.randint(0, n), pd.DataFrame([['new', 5.0, 5.0]], columns=['Label', 'Y', 'X']))
+        elif n > 3:
+            c.delete_rows(random.sample(list(c.df.index), 3))
+        # 无变化的操作不记入历史
+        if len(c.undo_stack) == before: continue
+        states.append(engine_state(c))
+        if random.random() < .3:
+            c.undo()
+            assert engine_state(c) == states[-2]
+            c.redo()
+            assert engine_state(c) == states[-1]
+    for state in reversed(states[:-1]):
+        assert c.undo() is not None
+        assert engine_state(c) == state
+    assert c.undo() is None
+    for state in states[1:]:
+        c.redo()
+        assert engine_state(c) == state
+
+
+def test_mark_on_deleted_row_is_ignored():
+    c = make_classifier(5, 0)
+    c.delete_rows([0])
+    assert c.toggle_mark(0) is None
+    assert not c.point_marked.any() and not c.marked_indices
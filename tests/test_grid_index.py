@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from matplotlib.path import Path
+
+from fl import GridIndex
+
+
+def brute_force(verts, x, y):
+    return np.flatnonzero(Path(verts).contains_points(np.column_stack([x, y])))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query_after_multi_row_insert(seed):
+    """多行插入 (新点落在中间隔着空单元的不同网格) 后，网格圈选与逐点判断一致"""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 10, 2000)
+    y = x + rng.normal(0, 0.3, 2000)  # 沿对角线分布，其余单元为空
+    grid = GridIndex(x, y)
+    for _ in range(20):
+        k, pos = int(rng.integers(2, 20)), int(rng.integers(0, len(x) + 1))
+        nx, ny = rng.uniform(0, 10, k), rng.uniform(0, 10, k)
+        grid.insert(pos, nx, ny)
+        x, y = np.insert(x, pos, nx), np.insert(y, pos, ny)
+    for center in rng.uniform(0, 10, (200, 2)):
+        verts = center + rng.uniform(-1, 1, (4, 2))
+        np.testing.assert_array_equal(grid.query(verts, x, y), brute_force(verts, x, y))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query_after_delete(seed):
+    rng = np.random.default_rng(seed)
+    x, y = rng.uniform(0, 10, 1000), rng.uniform(0, 10, 1000)
+    grid = GridIndex(x, y)
+    for _ in range(10):
+        pos = np.sort(rng.choice(len(x), int(rng.integers(1, 50)), replace=False))
+        grid.delete(pos, x[pos], y[pos])
+        x, y = np.delete(x, pos), np.delete(y, pos)
+    for center in rng.uniform(0, 10, (100, 2)):
+        verts = center + rng.uniform(-2, 2, (5, 2))
+        np.testing.assert_array_equal(grid.query(verts, x, y), brute_force(verts, x, y))